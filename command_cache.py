@@ -0,0 +1,131 @@
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from context_gatherer import write_json
+
+COMMAND_CACHE_FILE = "command_cache.json"
+MAX_ENTRIES = 500
+# Commands longer than this are one-offs, not worth remembering
+MAX_COMMAND_LENGTH = 500
+# Words that change how a request is phrased, not what it asks for
+FILLER_WORDS = {
+    "please", "kindly", "can", "could", "would", "you", "me", "my", "the",
+    "hey", "hi", "just", "i", "want", "need",
+}
+CONTRACTIONS = {
+    "what's": "what is", "where's": "where is", "how's": "how is",
+    "i'm": "i am", "don't": "do not", "can't": "cannot", "it's": "it is",
+}
+
+def normalize_prompt(prompt):
+    """Lower-case, expand contractions and drop filler, keeping paths and word order"""
+    prompt = prompt.lower().replace("’", "'")
+    for short, full in CONTRACTIONS.items():
+        prompt = re.sub(rf"\b{re.escape(short)}", full, prompt)
+    words = re.findall(r"[\w./~-]+", prompt)
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+class CommandCache:
+    """Commands that worked before, keyed by normalized prompt, OS and context hash.
+
+    Least recently used entries are evicted past MAX_ENTRIES. Entries made
+    under a different context hash (OS update, new tools installed) are
+    dropped the first time the new hash is seen.
+    """
+
+    def __init__(self, path=COMMAND_CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.context_hash = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # Saved least recently used first, so the order survives restarts
+        self.entries = OrderedDict((entry["key"], entry) for entry in data.get("entries", []))
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+
+    def _save(self):
+        write_json(self.path, {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": list(self.entries.values()),
+        })
+
+    @staticmethod
+    def key(prompt, os_name, context_hash):
+        return f"{os_name}|{context_hash}|{normalize_prompt(prompt)}"
+
+    def _invalidate(self, context_hash):
+        if context_hash == self.context_hash:
+            return
+        self.context_hash = context_hash
+        stale = [key for key, entry in self.entries.items() if entry["context"] != context_hash]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            logging.info(f"System context changed, dropped {len(stale)} cached commands")
+            self._save()
+
+    def get(self, prompt, os_name, context_hash):
+        """The cached command for this request, or None; counts the hit or miss.
+
+        Lookups stay in memory; the file is written on put, discard and invalidation.
+        A ``context_hash`` of None (context still being gathered) always misses.
+        """
+        if context_hash is None:
+            self.misses += 1
+            return None
+        self._invalidate(context_hash)
+        entry = self.entries.get(self.key(prompt, os_name, context_hash))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            entry["hits"] += 1
+            entry["used_at"] = time.time()
+            self.entries.move_to_end(entry["key"])
+        logging.info(f"Command cache {'hit' if entry else 'miss'}: {prompt} ({self.stats()})")
+        return entry["command"] if entry else None
+
+    def put(self, prompt, os_name, context_hash, command):
+        """Remember a command that just worked for this request"""
+        if not command or len(command) > MAX_COMMAND_LENGTH or context_hash is None:
+            return
+        self._invalidate(context_hash)
+        key = self.key(prompt, os_name, context_hash)
+        previous = self.entries.get(key, {})
+        self.entries[key] = {
+            "key": key,
+            "prompt": prompt,
+            "context": context_hash,
+            "command": command,
+            "hits": previous.get("hits", 0) if previous.get("command") == command else 0,
+            "used_at": time.time(),
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._save()
+
+    def discard(self, prompt, os_name, context_hash):
+        """Forget a cached command that stopped working"""
+        if self.entries.pop(self.key(prompt, os_name, context_hash), None) is not None:
+            self._save()
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = f", {self.hits / total:.0%} hit rate" if total else ""
+        return f"{self.hits} hits, {self.misses} misses, {len(self.entries)} entries{rate}"
+
+command_cache = CommandCache()
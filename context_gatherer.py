@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+from colorama import Fore
+
+CONTEXT_COMMANDS_FILE = "context_commands.txt"
+SYSTEM_CONTEXT_FILE = "system_context.json"
+CONTEXT_CACHE_FILE = "context_cache.json"
+COMMAND_TIMEOUT = 5
+# Probes are mostly waiting on I/O (ping, curl, package managers), so a few run at once
+MAX_WORKERS = 8
+# How long a probe's result stays valid, by the volatility class it is tagged
+# with in context_commands.txt ("@static lscpu"); "@600" means 600 seconds
+VOLATILITY_TTLS = {
+    "static": 7 * 86400,
+    "daily": 86400,
+    "hourly": 3600,
+    "volatile": 0,
+}
+DEFAULT_TTL = VOLATILITY_TTLS["hourly"]
+# A failed probe is retried after at most this long, whatever its class
+FAILED_TTL = 60
+
+def detect_os():
+    """Detect the operating system"""
+    system = platform.system().lower()
+    return {
+        "darwin": "macos",
+        "linux": "linux",
+        "windows": "windows"
+    }.get(system, "unknown")
+
+def parse_context_line(line):
+    """Split an optionally tagged line into (command, ttl seconds)"""
+    if not line.startswith("@"):
+        return line, DEFAULT_TTL
+    tag, _, command = line[1:].partition(" ")
+    if tag.isdigit():
+        return command.strip(), int(tag)
+    if tag not in VOLATILITY_TTLS:
+        logging.warning(f"Unknown volatility class @{tag}, using the default TTL")
+    return command.strip(), VOLATILITY_TTLS.get(tag, DEFAULT_TTL)
+
+def load_context_commands():
+    """Load OS-specific context commands as (command, ttl) pairs"""
+    current_os = detect_os()
+    try:
+        with open(CONTEXT_COMMANDS_FILE, "r") as file:
+            commands = []
+            current_section = None
+            for line in file:
+                line = line.strip()
+                if line.startswith("#"):
+                    current_section = line[1:].strip().lower()
+                elif current_section == current_os and line:
+                    commands.append(parse_context_line(line))
+            return commands
+    except FileNotFoundError:
+        logging.error(f"Missing {CONTEXT_COMMANDS_FILE} file!")
+        return []
+
+def run_context_command(cmd):
+    """Run one probe and return its output, or the error text in its place"""
+    try:
+        result = subprocess.run(
+            cmd,
+            shell=True,
+            check=True,
+            text=True,
+            capture_output=True,
+            timeout=COMMAND_TIMEOUT
+        )
+        return result.stdout.strip(), True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        error_msg = f"Error: {e.stderr}" if isinstance(e, subprocess.CalledProcessError) else "Timeout"
+        return error_msg, False
+
+def write_json(path, data):
+    """Write via a temp file so readers never see half a file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+class ContextGatherer:
+    """Keeps system_context.json current, re-running only probes whose TTL ran out.
+
+    Results are cached in context_cache.json with the time they were taken and
+    a hash of their output. Fresh entries are written out immediately; expired
+    ones run on a small pool of background threads and land in the file one by
+    one, so the prompt loop starts right away with whatever context is there.
+    """
+
+    def __init__(self, probes, path=SYSTEM_CONTEXT_FILE, cache_path=CONTEXT_CACHE_FILE,
+                 max_workers=MAX_WORKERS):
+        self.commands = [cmd for cmd, _ in probes]
+        self.ttls = dict(probes)
+        self.path = path
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.os = detect_os()
+        self.cache = self._load_cache()
+        self.pending = queue.Queue()
+        self.in_flight = set()
+        self.workers = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        # Set once the startup gather has finished; unlike done, never cleared again
+        self.ready = threading.Event()
+        self.announced = False
+        self.started_at = None
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # A cache copied from another machine says nothing about this one
+        return cache.get("entries", {}) if cache.get("os") == self.os else {}
+
+    def is_expired(self, cmd, now=None):
+        entry = self.cache.get(cmd)
+        if entry is None:
+            return True
+        ttl = self.ttls[cmd] if entry.get("ok", True) else min(self.ttls[cmd], FAILED_TTL)
+        return (now or time.time()) - entry["ran_at"] >= ttl
+
+    def context_hash(self, min_ttl=VOLATILITY_TTLS["daily"]):
+        """Hash of the slow-changing probe results (OS version, hardware, installed tools).
+
+        None until the startup gather has finished: while probes are still
+        landing the hash changes with each one.
+        """
+        if not self.ready.is_set():
+            return None
+        with self.lock:
+            digests = [
+                (cmd, self.cache[cmd]["hash"]) for cmd in self.commands
+                if cmd in self.cache and self.ttls[cmd] >= min_ttl
+            ]
+        return hashlib.sha256(json.dumps([self.os, digests]).encode()).hexdigest()[:16]
+
+    def start(self):
+        """Write the cached context, then re-run expired probes in the background"""
+        self.started_at = time.perf_counter()
+        with self.lock:
+            self._save()
+        expired = self.refresh()
+        if not expired:
+            self._finish()
+        return self
+
+    def refresh(self, volatile=True):
+        """Queue every expired probe that isn't already running; returns how many.
+
+        @volatile probes (TTL 0) are always expired; pass ``volatile=False`` to
+        leave them at their startup result, as the per-prompt refresh does.
+        """
+        now = time.time()
+        with self.lock:
+            expired = [
+                cmd for cmd in self.commands
+                if cmd not in self.in_flight and self.is_expired(cmd, now)
+                and (volatile or self.ttls[cmd] > 0)
+            ]
+            if expired and not self.in_flight:
+                # A new round; "ready in Xs" is timed from here
+                self.started_at = time.perf_counter()
+            if expired:
+                self.done.clear()
+            for cmd in expired:
+                self.in_flight.add(cmd)
+                self.pending.put(cmd)
+            # Daemon threads, so quitting never waits on a slow probe
+            spawn = min(self.max_workers - self.workers, len(expired))
+            self.workers += spawn
+        for _ in range(spawn):
+            threading.Thread(target=self._work, daemon=True).start()
+        return len(expired)
+
+    def wait(self, timeout=None):
+        """Block until every queued probe has finished; False if the timeout ran out first"""
+        return self.done.wait(timeout)
+
+    def _work(self):
+        while True:
+            # Same lock as refresh(), so it never counts a worker that is on its way out
+            with self.lock:
+                try:
+                    cmd = self.pending.get_nowait()
+                except queue.Empty:
+                    self.workers -= 1
+                    return
+            start = time.perf_counter()
+            output, ok = run_context_command(cmd)
+            elapsed = time.perf_counter() - start
+            digest = hashlib.sha256(output.encode()).hexdigest()[:16]
+            previous = self.cache.get(cmd)
+            changed = "unchanged" if previous and previous["hash"] == digest else "changed"
+            if ok:
+                logging.info(f"Context command succeeded: {cmd} ({elapsed:.2f}s, {changed})")
+            else:
+                logging.error(f"Context command failed: {cmd} - {output} ({elapsed:.2f}s)")
+
+            with self.lock:
+                self.cache[cmd] = {
+                    "output": output,
+                    "ok": ok,
+                    "ran_at": time.time(),
+                    "elapsed": round(elapsed, 3),
+                    "hash": digest,
+                }
+                self.in_flight.discard(cmd)
+                self._save()
+            self._finish()
+
+    def _save(self):
+        # Keys in context_commands.txt order, whatever order the probes finished in
+        context = {"os": self.os}
+        context.update((cmd, self.cache[cmd]["output"]) for cmd in self.commands if cmd in self.cache)
+        write_json(self.path, context)
+        write_json(self.cache_path, {"os": self.os, "entries": self.cache})
+
+    def _finish(self):
+        """Mark the round done, unless a refresh has queued more probes in the meantime"""
+        with self.lock:
+            if self.in_flight:
+                return
+            total = time.perf_counter() - self.started_at
+            timings = {cmd: self.cache[cmd]["elapsed"] for cmd in self.commands if cmd in self.cache}
+            announce = not self.announced
+            self.announced = True
+            self.ready.set()
+            self.done.set()
+        slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:3]
+        summary = ", ".join(f"{cmd} {elapsed:.2f}s" for cmd, elapsed in slowest)
+        logging.info(
+            f"System context ready in {total:.2f}s"
+            + (f" (slowest probes: {summary})" if summary else "")
+        )
+        if announce:
+            # Later refreshes finish while the user is typing; keep those quiet
+            print(Fore.CYAN + f"=== System Context Saved ({total:.2f}s) ===")
+
+def execute_context_commands(wait=False):
+    """OS-aware context gathering in the background; returns the running ContextGatherer"""
+    print(Fore.CYAN + "\n=== Gathering System Context ===")
+    gatherer = ContextGatherer(load_context_commands()).start()
+    if wait:
+        gatherer.wait()
+    return gatherer
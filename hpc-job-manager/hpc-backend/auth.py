@@ -0,0 +1,105 @@
+import secrets
+import time
+
+from config import AUTH_IDLE_TIMEOUT, AUTH_TOKEN_TTL
+from ssh_pool import is_valid_username
+from state_store import state_store
+
+# Seconds between last-used updates written back for a token
+TOUCH_INTERVAL = 60
+
+
+class AuthError(Exception):
+    """Raised when a request carries no usable credentials; ``status`` is the HTTP code"""
+
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenStore:
+    """Opaque session tokens for users who have logged in once.
+
+    The password stays on the backend only (in the shared state store, so any
+    worker can serve the token), for re-establishing the user's pooled
+    ControlMaster if it drops; clients send the token instead. Tokens expire
+    AUTH_TOKEN_TTL seconds after login or AUTH_IDLE_TIMEOUT seconds after last
+    use, whichever comes first.
+    """
+
+    def __init__(self, store=state_store, ttl=AUTH_TOKEN_TTL, idle_timeout=AUTH_IDLE_TIMEOUT):
+        self.store = store
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+
+    def issue(self, username, password):
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        self.store.set(
+            f"token:{token}",
+            {"username": username, "password": password, "expires_at": now + self.ttl, "last_used": now},
+            ttl=self.ttl,
+        )
+        return token, now + self.ttl
+
+    def resolve(self, token):
+        """Return (username, password) for a live token, or None"""
+        now = time.time()
+        session = self.store.get(f"token:{token}")
+        if session is None:
+            return None
+        if now - session["last_used"] > self.idle_timeout:
+            self.store.delete(f"token:{token}")
+            return None
+        # Idle time only needs minute resolution; skip a store write on most calls
+        if now - session["last_used"] > TOUCH_INTERVAL:
+            session["last_used"] = now
+            self.store.set(f"token:{token}", session, ttl=session["expires_at"] - now)
+        return session["username"], session["password"]
+
+    def revoke(self, token):
+        if self.store.get(f"token:{token}") is None:
+            return False
+        self.store.delete(f"token:{token}")
+        return True
+
+    def revoke_user(self, username):
+        """Log ``username`` out everywhere"""
+        for key, session in self.store.scan("token:").items():
+            if session["username"] == username:
+                self.store.delete(key)
+
+    def has_sessions(self, username):
+        return any(session["username"] == username for session in self.store.scan("token:").values())
+
+
+def bearer_token(authorization):
+    """Token from an ``Authorization: Bearer <token>`` header, or None"""
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip() or None
+    return None
+
+
+def resolve_credentials(username, password, authorization):
+    """(username, password) from the bearer token if one was sent, else from the request.
+
+    Raises AuthError when the username is malformed, the token is unknown or
+    expired or belongs to someone else, or when neither a token nor a password
+    was given.
+    """
+    if username and not is_valid_username(username):
+        raise AuthError("Invalid username", status=422)
+    token = bearer_token(authorization)
+    if token:
+        credentials = token_store.resolve(token)
+        if credentials is None:
+            raise AuthError("Session expired, please log in again")
+        if username and username != credentials[0]:
+            raise AuthError("Token does not belong to this user", status=403)
+        return credentials
+    if username and password:
+        return username, password
+    raise AuthError("Log in first or include a password")
+
+
+token_store = TokenStore()
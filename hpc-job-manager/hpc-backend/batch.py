@@ -0,0 +1,140 @@
+import base64
+import re
+import shlex
+import uuid
+
+from services import CPUS_PER_TASK, partition_for
+from ssh_pool import ssh_pool
+
+# Characters per shell command sent to the pooled login shell; bigger batches
+# are split over a few commands on the same connection
+BATCH_COMMAND_LIMIT = 32000
+RESULT_LINE = re.compile(r"^__SBATCH__ (\d+) (.*)$", re.MULTILINE)
+# "{2}" in a dependency refers to the job ID of entry 2 of the same batch
+BATCH_REFERENCE = re.compile(r"\{(\d+)\}")
+# Slurm's --dependency grammar, with "{n}" allowed wherever a job ID goes;
+# these values end up in the pooled login shell, so nothing else gets through
+_DEPENDENCY_ITEM = (
+    r"(?:after(?:ok|any|notok|corr|burstbuffer)?(?::(?:\d+|\{\d+\})(?:\+\d+)?)+|singleton)"
+)
+DEPENDENCY_PATTERN = re.compile(rf"^{_DEPENDENCY_ITEM}(?:[,?]{_DEPENDENCY_ITEM})*$")
+# One word per #SBATCH line: no spaces, quotes or newlines
+JOB_NAME_PATTERN = re.compile(r"^[\w.+-]{1,128}$")
+ARRAY_PATTERN = re.compile(r"^[\d,:%-]+$")
+
+
+def batch_job_problem(index, job, defaults):
+    """Why entry ``index`` can't be submitted, or None if it can"""
+    if not job.get("command") and not job.get("script"):
+        return f"Job {index} needs a command or a script"
+    name = job.get("name") or defaults["name"]
+    if not JOB_NAME_PATTERN.match(name):
+        return f"Job {index} has an invalid name; use letters, digits, '.', '+', '-' or '_'"
+    if job.get("array") and not ARRAY_PATTERN.match(job["array"]):
+        return f"Job {index} has an invalid array spec {job['array']!r}"
+    dependency = job.get("dependency")
+    if dependency:
+        if not DEPENDENCY_PATTERN.match(dependency):
+            return f"Job {index} has an invalid dependency {dependency!r}"
+        for reference in BATCH_REFERENCE.findall(dependency):
+            if int(reference) >= index:
+                return f"Job {index} depends on {{{reference}}}, which isn't an earlier entry"
+    return None
+
+
+def render_sbatch_script(job, defaults):
+    """Render one batch entry as an sbatch script; entry fields override ``defaults``"""
+    settings = {**defaults, **{k: v for k, v in job.items() if v is not None}}
+
+    directives = [
+        f"--job-name={settings['name']}",
+        f"--nodes={settings['num_nodes']}",
+        f"--ntasks={settings['num_tasks']}",
+        f"--cpus-per-task={CPUS_PER_TASK}",
+        f"--time={settings['cpu_time']}",
+    ]
+    if partition_for(settings["use_gpu"]):
+        directives.append(f"--partition={partition_for(settings['use_gpu'])}")
+    if settings["use_gpu"]:
+        directives.append("--gres=gpu")
+    if settings.get("array"):
+        directives.append(f"--array={settings['array']}")
+    if settings.get("output"):
+        directives.append(f"--output={settings['output']}")
+
+    lines = ["#!/bin/bash"] + [f"#SBATCH {directive}" for directive in directives]
+    if settings.get("script"):
+        body = settings["script"]
+        # A full script brings its own shebang and may add #SBATCH lines of its own
+        if body.startswith("#!"):
+            body = body.split("\n", 1)[1] if "\n" in body else ""
+        lines.append(body)
+    else:
+        lines.append(settings["command"])
+    return "\n".join(lines) + "\n"
+
+
+def _submit_command(index, script, dependency, prefix):
+    """Shell snippet that submits one script and prints its result on a marked line"""
+    encoded = base64.b64encode(script.encode()).decode()
+    options = ""
+    if dependency:
+        # Earlier entries' job IDs live in shell variables set by their own snippets
+        # (trimmed to the bare job ID, dropping any ";cluster" suffix)
+        dependency = BATCH_REFERENCE.sub(lambda m: f"${{{prefix}{m.group(1)}%%[; ]*}}", dependency)
+        options = f'--dependency="{dependency}" '
+    return (
+        f"{prefix}{index}=$(echo {encoded} | base64 -d | sbatch --parsable {options}2>&1 | tr '\\n' ' '); "
+        f"echo \"__SBATCH__ {index} ${prefix}{index}\""
+    )
+
+
+def submit_batch(username, password, jobs, defaults):
+    """Submit every entry with sbatch over the user's pooled connection.
+
+    All scripts are piped through base64 in as few shell commands as fit under
+    BATCH_COMMAND_LIMIT (usually one), so a sweep of hundreds of jobs costs a
+    single round trip instead of hundreds of logins. Returns one result dict
+    per entry, in order.
+    """
+    for index, job in enumerate(jobs):
+        problem = batch_job_problem(index, job, defaults)
+        if problem:
+            raise ValueError(problem)
+
+    prefix = f"_sb{uuid.uuid4().hex[:8]}_"
+    snippets = []
+    for index, job in enumerate(jobs):
+        script = render_sbatch_script(job, defaults)
+        snippets.append(_submit_command(index, script, job.get("dependency"), prefix))
+
+    commands, current = [], ""
+    for snippet in snippets:
+        if current and len(current) + len(snippet) > BATCH_COMMAND_LIMIT:
+            commands.append(current)
+            current = ""
+        current = f"{current}; {snippet}" if current else snippet
+
+    output = ""
+    for command in commands + [current]:
+        output += ssh_pool.run(username, password, command, timeout=60)
+    # Don't leave this batch's job IDs lying around in the shared shell
+    ssh_pool.run(username, password, f"unset $(compgen -v {shlex.quote(prefix)})")
+
+    results = [
+        {"index": index, "name": job.get("name") or defaults["name"], "job_id": None, "error": None}
+        for index, job in enumerate(jobs)
+    ]
+    for match in RESULT_LINE.finditer(output):
+        result = results[int(match.group(1))]
+        value = match.group(2).strip()
+        # --parsable prints "jobid" or "jobid;cluster"
+        job_id = value.split(";")[0]
+        if job_id.isdigit():
+            result["job_id"] = job_id
+        else:
+            result["error"] = value or "sbatch produced no output"
+    for result in results:
+        if result["job_id"] is None and result["error"] is None:
+            result["error"] = "No result from sbatch"
+    return results
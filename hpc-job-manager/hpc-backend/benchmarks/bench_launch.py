@@ -0,0 +1,48 @@
+"""Measure time-to-URL of HPCSessionManager against the fake ssh/srun/jupyter shims.
+
+Usage: python benchmarks/bench_launch.py [runs]
+
+FAKE_ALLOC_DELAY and FAKE_JUPYTER_DELAY (seconds) control how long the fake
+srun and jupyter take, e.g. FAKE_ALLOC_DELAY=0.2 for a quiet cluster.
+"""
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ["HPC_SSH_COMMAND"] = os.path.join(BENCH_DIR, "fake_hpc", "ssh")
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from services import HPCSessionManager  # noqa: E402
+from ssh_pool import ssh_pool  # noqa: E402
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    timings = []
+    for run in range(runs):
+        manager = HPCSessionManager(
+            "user", "password", use_gpu=False, cpu_time="01:00:00", num_nodes=1, num_tasks=1
+        )
+        started = time.perf_counter()
+        success, jupyter_url = manager.start()
+        elapsed = time.perf_counter() - started
+        manager.running = False
+        manager.cleanup()
+        if not success:
+            print(f"run {run + 1}: launch failed")
+            continue
+        timings.append(elapsed)
+        print(f"run {run + 1}: {elapsed:.2f}s -> {jupyter_url}")
+
+    ssh_pool.close_all()
+    if timings:
+        print(
+            f"\ntime-to-URL over {len(timings)} runs: "
+            f"min {min(timings):.2f}s, mean {sum(timings) / len(timings):.2f}s, "
+            f"max {max(timings):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
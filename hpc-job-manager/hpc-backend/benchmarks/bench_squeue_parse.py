@@ -0,0 +1,96 @@
+"""Compare the squeue parsers on synthetic rows.
+
+Usage: python benchmarks/bench_squeue_parse.py [rows ...]   (default: 10000 100000)
+
+"legacy" is the old fixed-width --Format parser that built a dict per job;
+"delimited" is parse_squeue_output over --noheader -o '%i|...|%j' output.
+"""
+import os
+import sys
+import gc
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from squeue import parse_squeue_output  # noqa: E402
+
+STATES = ("RUNNING", "PENDING", "CONFIGURING", "COMPLETING")
+
+
+def fixed_width_output(rows):
+    """Mimic --Format=Field:10 output, which truncates each field to its column width"""
+
+    def col(value, width=10):
+        return f"{value[:width - 1]:<{width}}"
+
+    lines = ["JOBID     PARTITION NAME                          USER      STATE     TIME      NODES     NODELIST"]
+    for i in range(rows):
+        lines.append(
+            col(f"{i}_{i % 50}") + col("gpu") + col(f"sweep-{i % 97}", 30) + col("017440488")
+            + col(STATES[i % 4]) + col("1:02:03") + col("1") + col(f"cs{i % 40:03d}", 30)
+        )
+    return "\n".join(lines)
+
+
+def delimited_output(rows):
+    return "\n".join(
+        f"{i}_{i % 50}|gpu|017440488|{STATES[i % 4]}|1:02:03|1|cs{i % 40:03d}|sweep-{i % 97}"
+        for i in range(rows)
+    )
+
+
+def legacy_parse(output):
+    jobs = []
+    for line in output.split("\n")[1:]:
+        if line.strip():
+            parts = line.split()
+            if len(parts) >= 8:
+                jobs.append({
+                    "job_id": parts[0],
+                    "partition": parts[1],
+                    "name": parts[2],
+                    "user": parts[3],
+                    "status": parts[4],
+                    "time": parts[5],
+                    "nodes": parts[6],
+                    "nodelist": parts[7],
+                })
+    return jobs
+
+
+def measure(parse, output, repeats=5):
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            parse(output)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    jobs = parse(output)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, size, len(jobs)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for rows in sizes:
+        print(f"\n{rows} rows")
+        for label, parse, output in (
+            ("legacy", legacy_parse, fixed_width_output(rows)),
+            ("delimited", parse_squeue_output, delimited_output(rows)),
+        ):
+            seconds, size, parsed = measure(parse, output)
+            print(
+                f"  {label:<10} {seconds * 1000:8.1f} ms  "
+                f"{rows / seconds:>12,.0f} rows/s  {size / 1e6:7.1f} MB retained  ({parsed} jobs)"
+            )
+
+
+if __name__ == "__main__":
+    main()
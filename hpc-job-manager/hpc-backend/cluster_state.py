@@ -0,0 +1,277 @@
+import re
+import threading
+import time
+
+from config import CLUSTER_STATE_INTERVAL, CLUSTER_STATE_TTL
+from services import CPUS_PER_TASK, partition_for
+from ssh_pool import ssh_pool
+from state_store import leader, state_store
+
+SINFO_FORMAT = "-h -o '%P|%a|%C|%D|%l'"
+# `scontrol show node -o` is "Key=Value Key=Value ..." where some values
+# (OS, Reason) contain spaces, so a value runs until the next " Key="
+NODE_FIELD = re.compile(r"(\w+)=(.*?)(?=\s+\w+=|\s*$)")
+GRES_GPUS = re.compile(r"gpu(?::[^:,(]+)?:(\d+)")
+TRES_GPUS = re.compile(r"gres/gpu(?::[^=,]+)?=(\d+)")
+# State-store key holding the leader's latest sinfo/scontrol output
+SHARED_KEY = "cluster:raw"
+# Node state flags that mean no new job will be placed there
+UNUSABLE_STATES = {"DOWN", "DRAIN", "DRAINED", "DRAINING", "FAIL", "FAILING", "MAINT", "FUTURE"}
+
+
+class NodeState:
+    """One compute node from ``scontrol show node``; slotted like SqueueJob"""
+
+    __slots__ = (
+        "name", "state", "partitions", "cpus_total", "cpus_alloc",
+        "gpus_total", "gpus_alloc", "memory_total", "memory_alloc",
+    )
+
+    def __init__(self, name, state, partitions, cpus_total, cpus_alloc,
+                 gpus_total, gpus_alloc, memory_total, memory_alloc):
+        self.name = name
+        self.state = state
+        self.partitions = partitions
+        self.cpus_total = cpus_total
+        self.cpus_alloc = cpus_alloc
+        self.gpus_total = gpus_total
+        self.gpus_alloc = gpus_alloc
+        self.memory_total = memory_total
+        self.memory_alloc = memory_alloc
+
+    @property
+    def usable(self):
+        # "IDLE+DRAIN", "MIXED*" (not responding), ...
+        flags = set(self.state.rstrip("*").split("+"))
+        return not self.state.endswith("*") and not flags & UNUSABLE_STATES
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "usable": self.usable,
+            "partitions": list(self.partitions),
+            "cpus_total": self.cpus_total,
+            "cpus_free": self.cpus_total - self.cpus_alloc if self.usable else 0,
+            "gpus_total": self.gpus_total,
+            "gpus_free": self.gpus_total - self.gpus_alloc if self.usable else 0,
+            "memory_total": self.memory_total,
+            "memory_alloc": self.memory_alloc,
+        }
+
+
+def _int(value):
+    return int(value) if value and value.isdigit() else 0
+
+
+def parse_node_output(output):
+    """Parse `scontrol show node -o` (one node per line) into NodeState records"""
+    nodes = []
+    for line in output.splitlines():
+        fields = dict(NODE_FIELD.findall(line.strip()))
+        if "NodeName" not in fields:
+            continue
+        gres = GRES_GPUS.search(fields.get("Gres", ""))
+        alloc_gpus = TRES_GPUS.search(fields.get("AllocTRES", ""))
+        nodes.append(NodeState(
+            fields["NodeName"],
+            fields.get("State", "UNKNOWN"),
+            tuple(p for p in fields.get("Partitions", "").split(",") if p),
+            _int(fields.get("CPUTot")),
+            _int(fields.get("CPUAlloc")),
+            int(gres.group(1)) if gres else 0,
+            int(alloc_gpus.group(1)) if alloc_gpus else 0,
+            _int(fields.get("RealMemory")),
+            _int(fields.get("AllocMem")),
+        ))
+    return nodes
+
+
+def parse_sinfo_output(output):
+    """Rows of `sinfo -h -o '%P|%a|%C|%D|%l'` -> {partition: {...}}; '*' marks the default"""
+    partitions = {}
+    for line in output.splitlines():
+        fields = line.strip().split("|")
+        if len(fields) != 5:
+            continue
+        name, availability, cpus, nodes, time_limit = fields
+        counts = cpus.split("/")
+        if len(counts) != 4 or not all(count.isdigit() for count in counts):
+            continue
+        allocated, idle, other, total = map(int, counts)
+        partitions[name.rstrip("*")] = {
+            "default": name.endswith("*"),
+            "up": availability == "up",
+            "nodes": _int(nodes),
+            "time_limit": time_limit,
+            "cpus_allocated": allocated,
+            "cpus_idle": idle,
+            "cpus_other": other,
+            "cpus_total": total,
+        }
+    return partitions
+
+
+class ClusterState:
+    """In-memory snapshot of partitions and nodes shared by every user.
+
+    One background refresh (sinfo plus ``scontrol show node -o``) per interval
+    serves all readers; callers get the data with its age and a staleness flag
+    rather than waiting on the cluster.
+    """
+
+    def __init__(self, interval=CLUSTER_STATE_INTERVAL, ttl=CLUSTER_STATE_TTL):
+        self.interval = interval
+        self.ttl = ttl
+        self.partitions = {}
+        self.nodes = {}
+        self.nodes_by_partition = {}
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.credentials = None
+        self.refresh_thread = None
+
+    def start(self, credentials):
+        """Refresh every interval using ``credentials()`` -> (user, password)"""
+        self.credentials = credentials
+        if self.refresh_thread is None or not self.refresh_thread.is_alive():
+            self.refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self.refresh_thread.start()
+
+    def refresh(self, username, password):
+        with self.refresh_lock:
+            sinfo = ssh_pool.run(username, password, f"sinfo {SINFO_FORMAT}")
+            nodes = ssh_pool.run(username, password, "scontrol show node -o")
+            refreshed_at = time.time()
+            self._load(sinfo, nodes, refreshed_at)
+        # Raw output is compact and lets other workers reuse this refresh
+        state_store.set(SHARED_KEY, {"sinfo": sinfo, "nodes": nodes, "refreshed_at": refreshed_at})
+
+    def load_shared(self):
+        """Take the leader's latest refresh from the state store if it is newer"""
+        shared = state_store.get(SHARED_KEY)
+        if shared and shared["refreshed_at"] > (self.refreshed_at or 0):
+            self._load(shared["sinfo"], shared["nodes"], shared["refreshed_at"])
+
+    def _load(self, sinfo_output, node_output, refreshed_at):
+        partitions = parse_sinfo_output(sinfo_output)
+        nodes = parse_node_output(node_output)
+        by_partition = {}
+        for node in nodes:
+            for partition in node.partitions:
+                by_partition.setdefault(partition, []).append(node.name)
+        with self.lock:
+            self.partitions = partitions
+            self.nodes = {node.name: node for node in nodes}
+            self.nodes_by_partition = by_partition
+            self.refreshed_at = refreshed_at
+
+    def ensure_fresh(self, username, password):
+        """Refresh inline with the caller's login if the snapshot is missing or stale"""
+        if self.is_stale():
+            self.load_shared()
+        if self.is_stale():
+            try:
+                self.refresh(username, password)
+            except Exception as e:
+                print(f"⚠️ Cluster state refresh failed: {e}")
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                if not leader.is_leader:
+                    self.load_shared()
+                else:
+                    username, password = self.credentials()
+                    if username:
+                        self.refresh(username, password)
+            except Exception as e:
+                print(f"Cluster state refresh error: {e}")
+            time.sleep(self.interval)
+
+    def age(self):
+        return None if self.refreshed_at is None else time.time() - self.refreshed_at
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age > self.ttl
+
+    def _freshness(self):
+        age = self.age()
+        return {
+            "refreshed_at": self.refreshed_at,
+            "age": round(age, 1) if age is not None else None,
+            "stale": self.is_stale(),
+        }
+
+    def get_partitions(self):
+        """Partition summaries with free CPUs/GPUs counted from usable nodes"""
+        with self.lock:
+            partitions = {}
+            for name, info in self.partitions.items():
+                nodes = [self.nodes[n] for n in self.nodes_by_partition.get(name, ()) if n in self.nodes]
+                usable = [node for node in nodes if node.usable]
+                partitions[name] = {
+                    **info,
+                    "nodes_usable": len(usable),
+                    "cpus_free": sum(node.cpus_total - node.cpus_alloc for node in usable),
+                    "gpus_total": sum(node.gpus_total for node in nodes),
+                    "gpus_free": sum(node.gpus_total - node.gpus_alloc for node in usable),
+                }
+            return {**self._freshness(), "partitions": partitions}
+
+    def get_nodes(self, partition=None, usable=None, gpu=None):
+        with self.lock:
+            names = self.nodes_by_partition.get(partition, ()) if partition else self.nodes
+            nodes = [self.nodes[name] for name in names if name in self.nodes]
+        nodes = [
+            node.to_dict()
+            for node in nodes
+            if (usable is None or node.usable == usable)
+            and (gpu is None or (node.gpus_total > 0) == gpu)
+        ]
+        return {**self._freshness(), "nodes": nodes}
+
+    def default_partition(self):
+        with self.lock:
+            return next((name for name, info in self.partitions.items() if info["default"]), None)
+
+    def check_capacity(self, use_gpu, num_nodes, num_tasks):
+        """Reason a launch of this shape can never be placed, or None if it can.
+
+        Only impossible requests are refused (partition down, too few healthy
+        nodes, more CPUs per node than any node has, GPUs where there are none);
+        a busy cluster just means queueing. Without a fresh snapshot nothing is
+        refused.
+        """
+        if self.is_stale():
+            return None
+        partition = partition_for(use_gpu) or self.default_partition()
+        with self.lock:
+            info = self.partitions.get(partition)
+            if info is None:
+                return f"Partition {partition or '(default)'} does not exist"
+            if not info["up"]:
+                return f"Partition {partition} is down"
+            usable = [
+                self.nodes[name] for name in self.nodes_by_partition.get(partition, ())
+                if name in self.nodes and self.nodes[name].usable
+            ]
+
+        if use_gpu:
+            usable = [node for node in usable if node.gpus_total > 0]
+        if len(usable) < num_nodes:
+            kind = "GPU nodes" if use_gpu else "nodes"
+            return f"Partition {partition} has {len(usable)} usable {kind}, {num_nodes} requested"
+        cpus_per_node = -(-num_tasks // num_nodes) * CPUS_PER_TASK
+        largest = max((node.cpus_total for node in usable), default=0)
+        if cpus_per_node > largest:
+            return (
+                f"{num_tasks} tasks on {num_nodes} node(s) needs {cpus_per_node} CPUs per node; "
+                f"the largest node in {partition} has {largest}"
+            )
+        return None
+
+
+cluster_state = ClusterState()
@@ -4,3 +4,113 @@ import os
 load_dotenv()
 
 HPC_HOST = os.getenv("HPC_HOST", "coe-hpc1.sjsu.edu")
+
+# SSH connection pool
+SSH_COMMAND = os.getenv("HPC_SSH_COMMAND", "ssh")
+SSH_CONTROL_DIR = os.getenv("HPC_SSH_CONTROL_DIR", "/tmp/hpc-ssh")
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv("HPC_SSH_POOL_IDLE_TIMEOUT", "600"))
+SSH_POOL_HEALTH_INTERVAL = int(os.getenv("HPC_SSH_POOL_HEALTH_INTERVAL", "60"))
+
+# Job monitoring: "per_user" runs one squeue per monitored user, "shared" runs
+# a single cluster-wide squeue per cycle (as HPC_SERVICE_USER, which "shared"
+# requires) and fans the rows out by user.
+MONITOR_MODE = os.getenv("HPC_MONITOR_MODE", "per_user")
+MONITOR_PARTITIONS = [p for p in os.getenv("HPC_MONITOR_PARTITIONS", "").split(",") if p]
+# Optional account for cluster-wide queries (shared squeue, sacct, sinfo);
+# those are skipped or done per user without it
+SERVICE_USER = os.getenv("HPC_SERVICE_USER")
+SERVICE_PASSWORD = os.getenv("HPC_SERVICE_PASSWORD")
+
+# Background Jupyter launches: at most LAUNCH_WORKERS run at once, the rest wait
+# in a FIFO queue of up to LAUNCH_QUEUE_LIMIT; each user may have
+# LAUNCH_PER_USER_LIMIT launches queued or running
+LAUNCH_WORKERS = int(os.getenv("HPC_LAUNCH_WORKERS", "8"))
+LAUNCH_QUEUE_LIMIT = int(os.getenv("HPC_LAUNCH_QUEUE_LIMIT", "200"))
+LAUNCH_PER_USER_LIMIT = int(os.getenv("HPC_LAUNCH_PER_USER_LIMIT", "2"))
+LAUNCH_RETENTION = int(os.getenv("HPC_LAUNCH_RETENTION", "3600"))
+
+# Partitions launches go to; an empty CPU partition means the cluster default
+CPU_PARTITION = os.getenv("HPC_CPU_PARTITION", "")
+GPU_PARTITION = os.getenv("HPC_GPU_PARTITION", "gpu")
+
+# Launch deadlines (seconds): waiting in the Slurm queue, then for Jupyter's token line
+ALLOCATION_TIMEOUT = int(os.getenv("HPC_ALLOCATION_TIMEOUT", "300"))
+JUPYTER_TIMEOUT = int(os.getenv("HPC_JUPYTER_TIMEOUT", "120"))
+# Number of job-list deltas kept per user for /running_jobs?since= catch-up
+MONITOR_CHANGE_HISTORY = int(os.getenv("HPC_MONITOR_CHANGE_HISTORY", "100"))
+
+# Adaptive job polling (seconds): fast while jobs are pending or a launch is in
+# flight, doubling from the base interval up to the max while nothing changes
+POLL_FAST = int(os.getenv("HPC_POLL_FAST", "5"))
+POLL_BASE = int(os.getenv("HPC_POLL_BASE", "30"))
+POLL_MAX = int(os.getenv("HPC_POLL_MAX", "300"))
+POLL_ACTIVITY_WINDOW = int(os.getenv("HPC_POLL_ACTIVITY_WINDOW", "120"))
+
+# Seconds between health checks of forwarded Jupyter ports
+TUNNEL_CHECK_INTERVAL = int(os.getenv("HPC_TUNNEL_CHECK_INTERVAL", "30"))
+
+# Local ports leased to Jupyter tunnels, and the port Jupyter starts probing
+# from on the compute node (it picks the next free one and reports it back)
+LOCAL_PORT_START = int(os.getenv("HPC_LOCAL_PORT_START", "10000"))
+LOCAL_PORT_END = int(os.getenv("HPC_LOCAL_PORT_END", "63999"))
+JUPYTER_BASE_PORT = int(os.getenv("HPC_JUPYTER_BASE_PORT", "8888"))
+
+# Slurm job-name prefix for Jupyter allocations; the launch profile is appended
+# so a restarted backend can find and reattach to sessions it started earlier
+JUPYTER_JOB_PREFIX = os.getenv("HPC_JUPYTER_JOB_PREFIX", "sjsu-jupyter")
+
+# Warm pool: Jupyter sessions pre-allocated for each logged-in user, under their
+# own account, and handed to their next /start_job for a matching profile, e.g.
+# "cpu-1x1=1,gpu-1x1=1" keeps one CPU and one GPU session ready per user. Empty
+# disables the pool. Idle sessions are cancelled after WARM_POOL_MAX_IDLE seconds;
+# WARM_POOL_RELEASE "refill" replaces them right away, "shrink" lets the user's
+# pool drain until they launch again.
+WARM_POOL = {
+    profile: int(size)
+    for profile, _, size in (
+        entry.partition("=") for entry in os.getenv("HPC_WARM_POOL", "").split(",") if entry
+    )
+}
+WARM_POOL_TIME = os.getenv("HPC_WARM_POOL_TIME", "04:00:00")
+WARM_POOL_MAX_IDLE = int(os.getenv("HPC_WARM_POOL_MAX_IDLE", "1800"))
+WARM_POOL_RELEASE = os.getenv("HPC_WARM_POOL_RELEASE", "refill")
+WARM_POOL_CHECK_INTERVAL = int(os.getenv("HPC_WARM_POOL_CHECK_INTERVAL", "15"))
+# At most WARM_POOL_FILL_WORKERS fills run at once (on top of LAUNCH_WORKERS),
+# and the pool never holds more than WARM_POOL_MAX_SESSIONS sessions in total
+WARM_POOL_FILL_WORKERS = int(os.getenv("HPC_WARM_POOL_FILL_WORKERS", "2"))
+WARM_POOL_MAX_SESSIONS = int(os.getenv("HPC_WARM_POOL_MAX_SESSIONS", "20"))
+
+# Finished-job history: sacct is polled every HISTORY_INTERVAL seconds into a
+# local SQLite file, starting HISTORY_BACKFILL_DAYS back on first run
+HISTORY_DB = os.getenv("HPC_HISTORY_DB", "hpc_history.db")
+HISTORY_INTERVAL = int(os.getenv("HPC_HISTORY_INTERVAL", "300"))
+HISTORY_BACKFILL_DAYS = int(os.getenv("HPC_HISTORY_BACKFILL_DAYS", "7"))
+
+# Wait-time estimates: scheduler and partition snapshots are reused for
+# ESTIMATE_TTL seconds, history looks back ESTIMATE_HISTORY_DAYS, and launches
+# expected to wait longer than MAX_EXPECTED_WAIT seconds are refused (0 disables)
+ESTIMATE_TTL = int(os.getenv("HPC_ESTIMATE_TTL", "60"))
+ESTIMATE_HISTORY_DAYS = int(os.getenv("HPC_ESTIMATE_HISTORY_DAYS", "14"))
+MAX_EXPECTED_WAIT = int(os.getenv("HPC_MAX_EXPECTED_WAIT", "0"))
+
+# Cluster state (sinfo + scontrol show node) is refreshed every
+# CLUSTER_STATE_INTERVAL seconds and reported stale after CLUSTER_STATE_TTL
+CLUSTER_STATE_INTERVAL = int(os.getenv("HPC_CLUSTER_STATE_INTERVAL", "30"))
+CLUSTER_STATE_TTL = int(os.getenv("HPC_CLUSTER_STATE_TTL", "120"))
+
+# Login tokens: valid for AUTH_TOKEN_TTL seconds after /login, or until unused
+# for AUTH_IDLE_TIMEOUT seconds
+AUTH_TOKEN_TTL = int(os.getenv("HPC_AUTH_TOKEN_TTL", "28800"))
+AUTH_IDLE_TIMEOUT = int(os.getenv("HPC_AUTH_IDLE_TIMEOUT", "3600"))
+
+# Shared state for running several backend workers: "memory" (single worker),
+# "sqlite:///path/state.db" (workers on one host) or "redis://host:6379/0".
+# The worker holding the leader lease (renewed every LEADER_LEASE_TTL / 3
+# seconds) runs the job, cluster and history pollers; every worker answers
+# requests. Workers pick up monitor registrations every MONITOR_SYNC_INTERVAL.
+STATE_STORE = os.getenv("HPC_STATE_STORE", "memory")
+LEADER_LEASE_TTL = int(os.getenv("HPC_LEADER_LEASE_TTL", "15"))
+MONITOR_SYNC_INTERVAL = float(os.getenv("HPC_MONITOR_SYNC_INTERVAL", "1"))
+# Monitor registrations (which hold the user's password) lapse MONITOR_TTL
+# seconds after the last /start_monitoring, or at logout
+MONITOR_TTL = int(os.getenv("HPC_MONITOR_TTL", "28800"))
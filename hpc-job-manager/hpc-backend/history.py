@@ -0,0 +1,277 @@
+import re
+import sqlite3
+import threading
+import time
+
+from config import HISTORY_BACKFILL_DAYS, HISTORY_DB, HISTORY_INTERVAL
+from ssh_pool import ssh_pool
+from state_store import leader
+
+# Field order for `sacct --parsable2 -o`; JobName goes last so a name containing
+# the separator still parses (split with maxsplit)
+SACCT_FIELDS = "JobID,User,Partition,State,Submit,Start,End,AllocCPUS,AllocNodes,AllocTRES,JobName"
+# Finished states only, so a record never changes once it's been ingested
+SACCT_STATES = "CD,F,CA,TO,NF,OOM,PR,DL,BF"
+SACCT_TIME = "%Y-%m-%dT%H:%M:%S"
+# slurmdbd can record a job's end a little after the fact; re-read this much
+INGEST_OVERLAP = 300
+GPU_TRES = re.compile(r"gres/gpu(?::[^=,]+)?=(\d+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    partition TEXT,
+    state TEXT,
+    name TEXT,
+    submit INTEGER,
+    start INTEGER,
+    end INTEGER,
+    alloc_cpus INTEGER,
+    alloc_nodes INTEGER,
+    alloc_gpus INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_end ON jobs (end, job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_page ON jobs (COALESCE(end, 0), job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user, end);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, end);
+CREATE INDEX IF NOT EXISTS idx_jobs_partition ON jobs (partition, end);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+WAIT_PERCENTILES = """
+WITH waits AS (
+    SELECT partition, start - submit AS wait,
+           ROW_NUMBER() OVER (PARTITION BY partition ORDER BY start - submit) AS rank,
+           COUNT(*) OVER (PARTITION BY partition) AS total
+    FROM jobs
+    WHERE start IS NOT NULL AND end >= ? AND end < ?
+)
+SELECT partition, COUNT(*), AVG(wait),
+       MIN(CASE WHEN rank >= 0.5 * total THEN wait END),
+       MIN(CASE WHEN rank >= 0.9 * total THEN wait END),
+       MIN(CASE WHEN rank >= 0.95 * total THEN wait END),
+       MAX(wait)
+FROM waits
+GROUP BY partition
+ORDER BY partition
+"""
+
+
+def parse_slurm_time(value):
+    """Slurm timestamp to epoch seconds; None for Unknown/N/A/None (e.g. never started)"""
+    try:
+        return int(time.mktime(time.strptime(value, SACCT_TIME)))
+    except ValueError:
+        return None
+
+
+def parse_sacct_output(output):
+    """Parse `sacct --parsable2 --noheader` rows into tuples ready for insertion"""
+    rows = []
+    for line in output.splitlines():
+        fields = line.strip().split("|", SACCT_FIELDS.count(","))
+        if len(fields) != SACCT_FIELDS.count(",") + 1:
+            continue
+        job_id, user, partition, state, submit, start, end, cpus, nodes, tres, name = fields
+        if not user or not job_id[:1].isdigit():
+            continue
+        gpus = GPU_TRES.search(tres)
+        rows.append((
+            job_id, user, partition,
+            # "CANCELLED by 1234" -> "CANCELLED"
+            state.split()[0] if state else state,
+            name, parse_slurm_time(submit), parse_slurm_time(start), parse_slurm_time(end),
+            int(cpus) if cpus.isdigit() else 0,
+            int(nodes) if nodes.isdigit() else 0,
+            int(gpus.group(1)) if gpus else 0,
+        ))
+    return rows
+
+
+class JobHistory:
+    """Finished-job records ingested from sacct into a local SQLite database.
+
+    Ingestion is incremental: each run asks sacct only for jobs that ended after
+    the newest end time already stored, so slurmdbd sees one small query per
+    interval no matter how many people browse the history.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.ingest_thread = None
+        self.credentials = None
+        self.last_ingest = None
+
+    def start(self, credentials):
+        """Ingest every HISTORY_INTERVAL seconds using ``credentials()`` -> (user, password)"""
+        self.credentials = credentials
+        if self.ingest_thread is None or not self.ingest_thread.is_alive():
+            self.ingest_thread = threading.Thread(target=self._ingest_loop, daemon=True)
+            self.ingest_thread.start()
+
+    def high_water_mark(self):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'high_water_mark'").fetchone()
+        if row:
+            return int(row[0])
+        return int(time.time()) - HISTORY_BACKFILL_DAYS * 86400
+
+    def ingest(self, username, password):
+        """Pull jobs that ended since the high-water mark; returns the number stored"""
+        since = time.strftime(
+            SACCT_TIME, time.localtime(self.high_water_mark() - INGEST_OVERLAP)
+        )
+        output = ssh_pool.run(
+            username, password,
+            f"sacct -a -X -n -P -s {SACCT_STATES} -S {since} -E now -o {SACCT_FIELDS}",
+            timeout=120,
+        )
+        rows = parse_sacct_output(output)
+        ends = [row[7] for row in rows if row[7] is not None]
+        with self.lock, self.db:
+            # Overlapping windows are fine: the primary key dedupes
+            self.db.executemany(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            if ends:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('high_water_mark', ?)", (str(max(ends)),)
+                )
+        self.last_ingest = time.time()
+        return len(rows)
+
+    def _ingest_loop(self):
+        """Background thread that keeps the store up to date"""
+        while True:
+            username, password = self.credentials()
+            # Every worker reads the same file; only the leader writes to it
+            if username and leader.is_leader:
+                try:
+                    count = self.ingest(username, password)
+                    if count:
+                        print(f"📚 Ingested {count} finished jobs from sacct")
+                except Exception as e:
+                    print(f"Job history ingestion error: {e}")
+            time.sleep(HISTORY_INTERVAL)
+
+    def jobs(self, username=None, state=None, partition=None, since=None, until=None,
+             limit=50, cursor=None):
+        """Newest-first page of finished jobs; pass ``next_cursor`` back for the next page"""
+        clauses, params = [], []
+        for column, value in (("user", username), ("state", state), ("partition", partition)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("end >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("end < ?")
+            params.append(until)
+        if cursor:
+            # Keyset pagination: stays fast however deep the page is
+            try:
+                end, job_id = cursor.split(":", 1)
+                end = int(end)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            clauses.append("(COALESCE(end, 0), job_id) < (?, ?)")
+            params += [end, job_id]
+
+        # Jobs without an end time sort as end=0, i.e. after everything else
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            cursor_rows = self.db.execute(
+                f"SELECT * FROM jobs {where} ORDER BY COALESCE(end, 0) DESC, job_id DESC LIMIT ?",
+                params + [limit],
+            )
+            columns = [column[0] for column in cursor_rows.description]
+            jobs = [dict(zip(columns, row)) for row in cursor_rows.fetchall()]
+
+        next_cursor = None
+        if len(jobs) == limit:
+            next_cursor = f"{jobs[-1]['end'] or 0}:{jobs[-1]['job_id']}"
+        return {"jobs": jobs, "next_cursor": next_cursor}
+
+    def usage(self, group_by="user", since=None, until=None, username=None):
+        """CPU-hours, GPU-hours and job counts per user or partition, optionally for one user"""
+        if group_by not in ("user", "partition"):
+            raise ValueError("group_by must be 'user' or 'partition'")
+        user_clause = "AND user = ?" if username else ""
+        params = (since or 0, until or int(time.time()) + 1) + ((username,) if username else ())
+        with self.lock:
+            rows = self.db.execute(
+                f"""
+                SELECT {group_by}, COUNT(*),
+                       SUM(alloc_cpus * (end - start)) / 3600.0,
+                       SUM(alloc_gpus * (end - start)) / 3600.0
+                FROM jobs
+                WHERE start IS NOT NULL AND end >= ? AND end < ? {user_clause}
+                GROUP BY {group_by}
+                ORDER BY 3 DESC
+                """,
+                params,
+            ).fetchall()
+        return [
+            {group_by: key, "jobs": jobs, "cpu_hours": round(cpu or 0, 2), "gpu_hours": round(gpu or 0, 2)}
+            for key, jobs, cpu, gpu in rows
+        ]
+
+    def wait_times(self, since=None, until=None):
+        """Queue wait (start - submit) statistics per partition, in seconds"""
+        with self.lock:
+            rows = self.db.execute(
+                WAIT_PERCENTILES, (since or 0, until or int(time.time()) + 1)
+            ).fetchall()
+        return [
+            {
+                "partition": partition,
+                "jobs": jobs,
+                "mean": mean,
+                "p50": p50,
+                "p90": p90,
+                "p95": p95,
+                "max": longest,
+            }
+            for partition, jobs, mean, p50, p90, p95, longest in rows
+        ]
+
+    def shape_wait_times(self, partition, num_nodes, use_gpu, since):
+        """Wait percentiles for past jobs of one resource shape in a partition"""
+        with self.lock:
+            waits = [
+                row[0]
+                for row in self.db.execute(
+                    """
+                    SELECT start - submit FROM jobs
+                    WHERE partition = ? AND alloc_nodes = ? AND (alloc_gpus > 0) = ?
+                          AND start IS NOT NULL AND end >= ?
+                    ORDER BY 1
+                    """,
+                    (partition, num_nodes, int(use_gpu), since),
+                )
+            ]
+        if not waits:
+            return {"jobs": 0, "p50": None, "p90": None}
+        return {
+            "jobs": len(waits),
+            "p50": waits[len(waits) // 2],
+            "p90": waits[min(int(len(waits) * 0.9), len(waits) - 1)],
+        }
+
+    def status(self):
+        with self.lock:
+            count = self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {
+            "jobs": count,
+            "high_water_mark": self.high_water_mark(),
+            "last_ingest": self.last_ingest,
+        }
+
+
+job_history = JobHistory()
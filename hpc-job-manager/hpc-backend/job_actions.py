@@ -0,0 +1,85 @@
+import fnmatch
+import re
+import shlex
+
+from squeue import SQUEUE_FORMAT, parse_squeue_output
+from ssh_pool import ssh_pool
+
+# Batched form of each action: (command, separator between job IDs)
+JOB_ACTIONS = {
+    "cancel": ("scancel", " "),
+    "hold": ("scontrol hold", ","),
+    "release": ("scontrol release", ","),
+    "requeue": ("scontrol requeue", ","),
+}
+# Plain jobs, array tasks (123_4) and array ranges (123_[1-10%2]); anything else
+# is rejected before it gets near the shell
+JOB_ID_PATTERN = re.compile(r"^\d+(_\d+|_\[[\d,%-]+\])?$")
+RESULT_LINE = re.compile(r"^__JOB__ (\S+) (\d+) ?(.*)$", re.MULTILINE)
+
+
+def select_jobs(username, password, job_ids=(), name=None, states=(), partitions=()):
+    """Resolve a selection to job IDs; filters other than job_ids need one squeue"""
+    if not name and not states and not partitions:
+        return list(dict.fromkeys(job_ids))
+
+    output = ssh_pool.run(username, password, f"squeue -u {shlex.quote(username)} {SQUEUE_FORMAT}")
+    states = {state.upper() for state in states}
+    selected = []
+    for job in parse_squeue_output(output):
+        if job_ids and job.job_id not in job_ids:
+            continue
+        if name and not fnmatch.fnmatchcase(job.name, name):
+            continue
+        if states and job.status not in states:
+            continue
+        if partitions and job.partition not in partitions:
+            continue
+        selected.append(job.job_id)
+    return selected
+
+
+def run_job_action(username, password, action, job_ids):
+    """Apply ``action`` to every job in one command, returning a result per job.
+
+    The common case is a single ``scancel 1 2 3`` (or ``scontrol hold 1,2,3``)
+    round trip. If it reports any error the jobs are retried one by one, still
+    in a single shell command, to tell which ones failed.
+    """
+    command, separator = JOB_ACTIONS[action]
+    results = {job_id: {"job_id": job_id, "ok": False, "error": None} for job_id in job_ids}
+    valid = []
+    for job_id in job_ids:
+        if JOB_ID_PATTERN.match(job_id):
+            valid.append(job_id)
+        else:
+            results[job_id]["error"] = "Invalid job ID"
+    if not valid:
+        return list(results.values())
+
+    # Quoted so array ranges like 123_[1-10] aren't taken for globs
+    quoted = separator.join(shlex.quote(job_id) for job_id in valid)
+    output = ssh_pool.run(username, password, f"{command} {quoted} 2>&1; echo \"__RC__ $?\"")
+    if "__RC__ 0" in output and "error" not in output.lower():
+        for job_id in valid:
+            results[job_id]["ok"] = True
+        return list(results.values())
+
+    loop = (
+        f"for j in {' '.join(shlex.quote(job_id) for job_id in valid)}; do "
+        f"out=$({command} \"$j\" 2>&1); rc=$?; "
+        f"echo \"__JOB__ $j $rc $(echo \"$out\" | tr '\\n' ' ')\"; done"
+    )
+    output = ssh_pool.run(username, password, loop, timeout=max(30, len(valid)))
+    for match in RESULT_LINE.finditer(output):
+        job_id, rc, message = match.groups()
+        if job_id not in results:
+            continue
+        if rc == "0" and "error" not in message.lower():
+            results[job_id]["ok"] = True
+        else:
+            results[job_id]["error"] = message.strip() or f"{command} exited with {rc}"
+    for job_id in valid:
+        if not results[job_id]["ok"] and results[job_id]["error"] is None:
+            results[job_id]["error"] = "No result"
+    return list(results.values())
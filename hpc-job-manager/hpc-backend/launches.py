@@ -0,0 +1,272 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from config import (
+    LAUNCH_PER_USER_LIMIT,
+    LAUNCH_QUEUE_LIMIT,
+    LAUNCH_RETENTION,
+    LAUNCH_WORKERS,
+)
+from services import HPCSessionManager, session_profile
+from sessions import session_registry
+from state_store import state_store
+from warm_pool import warm_pool
+
+FINAL_STATUSES = ("ready", "failed")
+# Number of recent launches the wait/launch time metrics are computed over
+METRICS_WINDOW = 500
+
+
+class LaunchRejected(Exception):
+    """Raised when a launch would exceed the queue or per-user limits"""
+
+
+class Launch:
+    """One queued or running Jupyter launch and the progress events it has emitted"""
+
+    def __init__(self, username, profile):
+        self.launch_id = uuid.uuid4().hex
+        self.username = username
+        self.profile = profile
+        self.status = "queued"
+        self.jupyter_url = None
+        self.error = None
+        self.events = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.emit("queued")
+
+    def emit(self, stage, **data):
+        """Record a progress event (connected, allocated, jupyter_ready, tunnel_up, ...)"""
+        with self.lock:
+            self.events.append({"stage": stage, "time": time.time(), **data})
+        self.publish()
+
+    def publish(self):
+        """Mirror this launch to the state store so any worker can report on it"""
+        state_store.set(f"launch:{self.launch_id}", self.to_dict(), ttl=LAUNCH_RETENTION)
+
+    def events_since(self, index):
+        """Return events after ``index`` and whether the launch has finished"""
+        with self.lock:
+            return self.events[index:], self.status in FINAL_STATUSES
+
+    def finish(self, status, jupyter_url=None, error=None):
+        # emit() below publishes the final status
+        with self.lock:
+            self.status = status
+            self.jupyter_url = jupyter_url
+            self.error = error
+            self.finished_at = time.time()
+        if status == "ready":
+            self.emit("ready", jupyter_url=jupyter_url)
+        else:
+            self.emit("failed", error=error)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "launch_id": self.launch_id,
+                "username": self.username,
+                "profile": self.profile,
+                "status": self.status,
+                "jupyter_url": self.jupyter_url,
+                "error": self.error,
+                "queue_wait": (self.started_at or time.time()) - self.created_at,
+                "launch_time": (
+                    (self.finished_at or time.time()) - self.started_at
+                    if self.started_at
+                    else None
+                ),
+                "events": list(self.events),
+            }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class LaunchManager:
+    """Runs HPCSessionManager launches on a fixed set of workers fed by a FIFO queue.
+
+    Admission control keeps a burst of launches (a whole class clicking Launch
+    at once) from spawning unbounded SSH processes: at most ``max_workers``
+    run concurrently, the queue is capped, and each user gets a fixed quota.
+    """
+
+    def __init__(
+        self,
+        max_workers=LAUNCH_WORKERS,
+        queue_limit=LAUNCH_QUEUE_LIMIT,
+        per_user_limit=LAUNCH_PER_USER_LIMIT,
+    ):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.per_user_limit = per_user_limit
+        self.launches = {}
+        self.queue = deque()
+        self.running = 0
+        self.queue_waits = deque(maxlen=METRICS_WINDOW)
+        self.launch_times = deque(maxlen=METRICS_WINDOW)
+        self.outcomes = {"ready": 0, "failed": 0, "rejected": 0}
+        self.lock = threading.Condition()
+        self.workers = [
+            threading.Thread(target=self._work, name=f"hpc-launch-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job_request):
+        """Queue a launch and return its Launch handle immediately; raises LaunchRejected.
+
+        A repeat click while the same user's launch for the same profile is still
+        in flight gets that launch back rather than a second allocation.
+        """
+        username = job_request["username"]
+        profile = session_profile(
+            job_request["use_gpu"], job_request["num_nodes"], job_request["num_tasks"]
+        )
+        with self.lock:
+            self._prune()
+            in_flight = [
+                launch
+                for launch in self.launches.values()
+                if launch.username == username and launch.status not in FINAL_STATUSES
+            ]
+            for launch in in_flight:
+                if launch.profile == profile:
+                    return launch
+            active = len(in_flight)
+            if active >= self.per_user_limit:
+                self.outcomes["rejected"] += 1
+                raise LaunchRejected(
+                    f"{username} already has {active} launches in progress (limit {self.per_user_limit})"
+                )
+            if len(self.queue) >= self.queue_limit:
+                self.outcomes["rejected"] += 1
+                raise LaunchRejected("Launch queue is full, try again shortly")
+
+            launch = Launch(username, profile)
+            self.launches[launch.launch_id] = launch
+            self.queue.append((launch, job_request))
+            self.lock.notify()
+        return launch
+
+    def get(self, launch_id):
+        with self.lock:
+            return self.launches.get(launch_id)
+
+    def describe(self, launch_id):
+        """Launch status with queue position, from this worker or the state store"""
+        launch = self.get(launch_id)
+        if launch is not None:
+            return {**launch.to_dict(), "queue_position": self.queue_position(launch)}
+        published = state_store.get(f"launch:{launch_id}")
+        if published is None:
+            return None
+        # Only the worker running the launch knows its queue position
+        return {**published, "queue_position": None}
+
+    def events_since(self, launch_id, index):
+        """Launch.events_since for a launch running on this or another worker"""
+        launch = self.get(launch_id)
+        if launch is not None:
+            return launch.events_since(index)
+        published = state_store.get(f"launch:{launch_id}") or {"events": [], "status": "failed"}
+        return published["events"][index:], published["status"] in FINAL_STATUSES
+
+    def queue_position(self, launch):
+        """1-based position in the FIFO queue, or None once the launch has started"""
+        with self.lock:
+            for position, (queued, _) in enumerate(self.queue, start=1):
+                if queued is launch:
+                    return position
+        return None
+
+    def metrics(self):
+        with self.lock:
+            waits = list(self.queue_waits)
+            times = list(self.launch_times)
+            return {
+                "max_concurrency": self.max_workers,
+                "running": self.running,
+                "queued": len(self.queue),
+                "outcomes": dict(self.outcomes),
+                "queue_wait": {
+                    "mean": sum(waits) / len(waits) if waits else None,
+                    "p50": _percentile(waits, 0.5),
+                    "p95": _percentile(waits, 0.95),
+                },
+                "launch_time": {
+                    "mean": sum(times) / len(times) if times else None,
+                    "p50": _percentile(times, 0.5),
+                    "p95": _percentile(times, 0.95),
+                },
+            }
+
+    def _prune(self):
+        """Forget finished launches older than LAUNCH_RETENTION seconds"""
+        cutoff = time.time() - LAUNCH_RETENTION
+        for launch_id, launch in list(self.launches.items()):
+            if launch.status in FINAL_STATUSES and launch.created_at < cutoff:
+                del self.launches[launch_id]
+
+    def _work(self):
+        """Worker thread: take the oldest queued launch and run it to completion"""
+        while True:
+            with self.lock:
+                while not self.queue:
+                    self.lock.wait()
+                launch, job_request = self.queue.popleft()
+                self.running += 1
+                with launch.lock:
+                    launch.status = "running"
+                    launch.started_at = time.time()
+                self.queue_waits.append(launch.started_at - launch.created_at)
+            launch.publish()
+            try:
+                self._run(launch, job_request)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.launch_times.append(time.time() - launch.started_at)
+                    self.outcomes[launch.status] = self.outcomes.get(launch.status, 0) + 1
+
+    def _run(self, launch, job_request):
+        launch.emit("started")
+        try:
+            # A backend restart forgets sessions, but their Slurm jobs keep running
+            session = session_registry.reattach(
+                job_request["username"], job_request["password"], launch.profile
+            )
+            if session is not None:
+                # It may be a warm job nobody claimed yet; keep the pool from cancelling it
+                warm_pool.claim_job(session.username, session.slurm_job_id)
+                launch.emit("reattached", node=session.node, job_id=session.slurm_job_id)
+                launch.finish("ready", jupyter_url=session.jupyter_url)
+                return
+
+            session_manager = HPCSessionManager(**job_request, on_progress=launch.emit)
+            success, jupyter_url = session_manager.start()
+            if success:
+                session_registry.register(session_manager)
+        except Exception as e:
+            print(f"❌ Launch {launch.launch_id} error: {e}")
+            launch.finish("failed", error=str(e))
+            return
+
+        if success:
+            launch.finish("ready", jupyter_url=jupyter_url)
+        else:
+            launch.finish("failed", error="HPC job execution failed")
+
+
+launch_manager = LaunchManager()
@@ -1,11 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException
-from schemas import HPCJobRequest, HPCJobResponse
-from services import HPCSessionManager, HPCJobMonitor
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import FastAPI, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from schemas import (
+    BatchJobRequest,
+    BatchJobResponse,
+    BulkJobRequest,
+    HPCJobRequest,
+    HPCJobResponse,
+    LoginRequest,
+    WaitEstimateRequest,
+)
+from services import HPCSessionManager, session_profile
 from fastapi.middleware.cors import CORSMiddleware
 from models import JobCancelRequest, JobRequest
+from auth import AuthError, bearer_token, resolve_credentials, token_store
+from batch import batch_job_problem, submit_batch
+from cluster_state import cluster_state
+from config import MAX_EXPECTED_WAIT, SERVICE_PASSWORD, SERVICE_USER
+from history import job_history
+from job_actions import JOB_ACTIONS, run_job_action, select_jobs
+from launches import LaunchRejected, launch_manager
+from metrics import ACTIVE_MONITORS, ACTIVE_SESSIONS, ACTIVE_TUNNELS, registry
+from monitors import changes_since, monitor_registry
+from ports import port_registry
+from sessions import session_registry
+from ssh_pool import is_valid_username, ssh_pool
+from state_store import leader
+from tunnels import tunnel_manager
+from wait_estimator import wait_estimator
+from warm_pool import warm_pool
 app = FastAPI()
-# Store active monitoring sessions
-active_monitors = {}
 # Allow frontend to communicate with backend
 app.add_middleware(
     CORSMiddleware,
@@ -15,31 +42,293 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def authenticate(request, authorization):
+    """Fill in the request's credentials from its bearer token, or require a password"""
+    try:
+        request.username, request.password = resolve_credentials(
+            request.username, request.password, authorization
+        )
+    except AuthError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+def logged_in_user(authorization):
+    """Username behind the request's bearer token; 401 without a live token"""
+    token = bearer_token(authorization)
+    credentials = token_store.resolve(token) if token else None
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Log in first")
+    return credentials[0]
+
+ACTIVE_SESSIONS.set_function(lambda: len(session_registry.sessions))
+ACTIVE_TUNNELS.set_function(lambda: len(tunnel_manager.tunnels))
+ACTIVE_MONITORS.set_function(lambda: len(monitor_registry.monitors))
+
+@app.on_event("startup")
+def start_background_services():
+    # Every worker serves requests; the pollers below only do work on the leader
+    leader.start()
+    monitor_registry.start()
+    warm_pool.start()
+    # sacct -a reads everyone's records; never do that with a student's login
+    if SERVICE_USER:
+        job_history.start(lambda: (SERVICE_USER, SERVICE_PASSWORD))
+    else:
+        print("⚠️ HPC_SERVICE_USER is not set; job history ingestion disabled")
+    # Without a service account the snapshot is refreshed inline by each
+    # /start_job with the caller's own login (see ensure_fresh)
+    if SERVICE_USER:
+        cluster_state.start(lambda: (SERVICE_USER, SERVICE_PASSWORD))
+    else:
+        print("⚠️ HPC_SERVICE_USER is not set; background cluster state refresh disabled")
+
+@app.on_event("shutdown")
+def close_ssh_connections():
+    warm_pool.stop()
+    leader.step_down()
+    ssh_pool.close_all()
+
+@app.post("/login")
+def login(request: LoginRequest):
+    """Open the user's pooled ControlMaster once and hand back a token for later calls"""
+    if not is_valid_username(request.username):
+        raise HTTPException(status_code=422, detail="Invalid username")
+    try:
+        ssh_pool.get(request.username, request.password)
+    except Exception as e:
+        print(f"❌ Login failed for {request.username}: {e}")
+        raise HTTPException(status_code=401, detail="HPC login failed")
+    token, expires_at = token_store.issue(request.username, request.password)
+    warm_pool.warm(request.username, request.password)
+    return {"token": token, "username": request.username, "expires_at": expires_at}
+
+@app.post("/logout")
+def logout(everywhere: bool = False, authorization: Optional[str] = Header(None)):
+    """End this session, or with ``everywhere`` every session of the user"""
+    token = bearer_token(authorization)
+    credentials = token_store.resolve(token) if token else None
+    if not token or not token_store.revoke(token):
+        raise HTTPException(status_code=401, detail="Not logged in")
+    if credentials:
+        username = credentials[0]
+        if everywhere:
+            token_store.revoke_user(username)
+        if not token_store.has_sessions(username):
+            # Last session gone: stop the background work that holds their password
+            warm_pool.forget(username)
+            monitor_registry.unregister(username)
+    return {"message": "Logged out"}
+
 @app.post("/start_job", response_model=HPCJobResponse)
-async def start_hpc_job(job_request: HPCJobRequest):
-    print("Received request:", job_request.dict())  # Debugging log
-    session_manager = HPCSessionManager(**job_request.dict())
-    success, jupyter_url = session_manager.start()
-    
-    if not success:
-        raise HTTPException(status_code=500, detail="HPC job execution failed")
-    
-    return {"status": "Job started", "jupyter_url": jupyter_url}
+def start_hpc_job(job_request: HPCJobRequest, authorization: Optional[str] = Header(None)):
+    authenticate(job_request, authorization)
+    print("Received request:", {**job_request.dict(), "password": "***"})  # Debugging log
+    profile = session_profile(job_request.use_gpu, job_request.num_nodes, job_request.num_tasks)
+    session = session_registry.find(job_request.username, job_request.password, profile)
+    if session is not None:
+        return {"status": "Session reused", "launch_id": None, "jupyter_url": session.jupyter_url}
+
+    session = warm_pool.acquire(job_request.username, job_request.password, profile)
+    if session is not None:
+        return {"status": "Warm session assigned", "launch_id": None, "jupyter_url": session.jupyter_url}
+
+    # Don't send srun after a shape no node can ever satisfy
+    cluster_state.ensure_fresh(job_request.username, job_request.password)
+    problem = cluster_state.check_capacity(
+        job_request.use_gpu, job_request.num_nodes, job_request.num_tasks
+    )
+    if problem:
+        raise HTTPException(status_code=409, detail=problem)
+    if MAX_EXPECTED_WAIT:
+        check_expected_wait(job_request)
+
+    try:
+        launch = launch_manager.submit(job_request.dict())
+    except LaunchRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if monitor_registry.is_registered(job_request.username):
+        monitor_registry.expect_activity(job_request.username)
+    return {"status": "Launch queued", "launch_id": launch.launch_id}
+
+@app.post("/submit_batch", response_model=BatchJobResponse)
+def submit_batch_jobs(batch_request: BatchJobRequest, authorization: Optional[str] = Header(None)):
+    """Submit sbatch jobs (job arrays, dependencies) in one round trip and track them"""
+    authenticate(batch_request, authorization)
+    defaults = batch_request.dict(exclude={"username", "password", "jobs"})
+    for index, job in enumerate(batch_request.jobs):
+        problem = batch_job_problem(index, job.dict(), defaults)
+        if problem:
+            raise HTTPException(status_code=422, detail=problem)
+
+    try:
+        results = submit_batch(
+            batch_request.username,
+            batch_request.password,
+            [job.dict() for job in batch_request.jobs],
+            defaults,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Batch submission failed: {e}")
+
+    # Follow the new jobs through the regular job monitor
+    monitor_registry.register(batch_request.username, batch_request.password)
+    monitor_registry.expect_activity(batch_request.username)
+
+    submitted = sum(1 for result in results if result["job_id"])
+    return {"status": f"Submitted {submitted} of {len(results)} jobs", "results": results}
+
+def check_expected_wait(job_request):
+    """Refuse launches the scheduler won't start for a long time; estimator errors don't block"""
+    try:
+        estimate = wait_estimator.estimate(
+            job_request.username, job_request.password,
+            job_request.use_gpu, job_request.num_nodes, job_request.num_tasks,
+        )
+    except Exception as e:
+        print(f"⚠️ Wait estimate unavailable: {e}")
+        return
+    if estimate["estimate_seconds"] is not None and estimate["estimate_seconds"] > MAX_EXPECTED_WAIT:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Expected wait for {estimate['profile']} on {estimate['partition']} is about "
+                f"{estimate['estimate_seconds'] // 60} minutes; try a smaller shape or later"
+            ),
+        )
+
+@app.post("/estimate_wait")
+def estimate_wait(request: WaitEstimateRequest, authorization: Optional[str] = Header(None)):
+    """Predicted time-to-allocation for a resource shape, for the launch form"""
+    authenticate(request, authorization)
+    try:
+        return wait_estimator.estimate(
+            request.username, request.password, request.use_gpu, request.num_nodes, request.num_tasks
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Could not estimate wait: {e}")
+
+@app.get("/cluster/partitions")
+def get_cluster_partitions():
+    if cluster_state.refreshed_at is None:
+        raise HTTPException(status_code=503, detail="Cluster state not loaded yet")
+    return cluster_state.get_partitions()
+
+@app.get("/cluster/nodes")
+def get_cluster_nodes(
+    partition: Optional[str] = None, usable: Optional[bool] = None, gpu: Optional[bool] = None
+):
+    if cluster_state.refreshed_at is None:
+        raise HTTPException(status_code=503, detail="Cluster state not loaded yet")
+    return cluster_state.get_nodes(partition, usable, gpu)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint; each worker reports its own operations"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/launch_metrics")
+def get_launch_metrics():
+    return launch_manager.metrics()
+
+@app.get("/launch/{launch_id}")
+def get_launch(launch_id: str):
+    launch = launch_manager.describe(launch_id)
+    if launch is None:
+        raise HTTPException(status_code=404, detail="Launch not found")
+    return launch
+
+@app.get("/launch/{launch_id}/events")
+async def stream_launch_events(launch_id: str):
+    if await asyncio.to_thread(launch_manager.describe, launch_id) is None:
+        raise HTTPException(status_code=404, detail="Launch not found")
+
+    def poll(sent):
+        events, finished = launch_manager.events_since(launch_id, sent)
+        launch = launch_manager.get(launch_id)
+        return events, finished, launch_manager.queue_position(launch) if launch else None
+
+    async def event_stream():
+        sent = 0
+        position = None
+        while True:
+            # The launch may be running on another worker; then it is read from the
+            # state store, so keep those reads off the event loop
+            events, finished, new_position = await asyncio.to_thread(poll, sent)
+            for event in events:
+                yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+            sent += len(events)
+            if new_position != position and new_position is not None:
+                yield f"event: queue_position\ndata: {json.dumps({'stage': 'queue_position', 'position': new_position})}\n\n"
+            position = new_position
+            if finished:
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/tunnels")
+def list_tunnels(username: Optional[str] = None):
+    return {"tunnels": tunnel_manager.list(username)}
+
+@app.get("/sessions")
+def list_sessions(username: Optional[str] = None):
+    return {"sessions": session_registry.list(username)}
+
+@app.get("/warm_pool")
+def get_warm_pool():
+    return warm_pool.status()
+
+@app.get("/ports")
+def list_port_leases():
+    return {"leases": port_registry.list()}
 
 @app.get("/running_jobs/{username}")
-async def get_running_jobs(username: str):
-    if username not in active_monitors:
+def get_running_jobs(username: str, since: Optional[int] = None):
+    if not monitor_registry.is_registered(username):
+        raise HTTPException(status_code=404, detail="No monitoring session found for this user")
+
+    if since is None:
+        return monitor_registry.get_snapshot(username)
+    return monitor_registry.get_changes(username, since)
+
+@app.get("/running_jobs/{username}/stream")
+async def stream_running_jobs(username: str, since: int = -1):
+    """Server-sent events feed of job deltas; starts with a full snapshot unless ``since`` is given"""
+    if not await asyncio.to_thread(monitor_registry.is_registered, username):
         raise HTTPException(status_code=404, detail="No monitoring session found for this user")
 
-    jobs = active_monitors[username].get_current_jobs()
-    return {"jobs": jobs}
+    async def event_stream():
+        version = since
+        while True:
+            # The monitor runs on the leader; every worker reads its published state
+            state = await asyncio.to_thread(monitor_registry.get_state, username)
+            if version != state["version"]:
+                changes = changes_since(state, version)
+                version = changes["version"]
+                yield f"event: jobs\ndata: {json.dumps(changes)}\n\n"
+            await asyncio.sleep(1)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @app.delete("/cancel_job/{job_id}")
-async def cancel_job(job_id: str, username: str, password: str):
+def cancel_job(
+    job_id: str,
+    username: str,
+    password: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
+    try:
+        username, password = resolve_credentials(username, password, authorization)
+    except AuthError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
     success = HPCSessionManager.cancel_job(job_id, username, password)
     
     if not success:
         raise HTTPException(status_code=400, detail="Failed to cancel job")
+    session_registry.forget_job(job_id)
+    if monitor_registry.is_registered(username):
+        monitor_registry.refresh(username)
     
     return {"status": "Job canceled successfully"}
 
@@ -47,33 +336,106 @@ async def cancel_job(job_id: str, username: str, password: str):
 
 
 
+@app.post("/jobs/bulk")
+def bulk_job_action(request: BulkJobRequest, authorization: Optional[str] = Header(None)):
+    """Cancel, hold, release or requeue many jobs with one scancel/scontrol call"""
+    authenticate(request, authorization)
+    if request.action not in JOB_ACTIONS:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown action {request.action}; use one of {', '.join(JOB_ACTIONS)}"
+        )
+    if not (request.job_ids or request.name or request.states or request.partitions):
+        raise HTTPException(status_code=422, detail="Select jobs by job_ids, name, states or partitions")
+
+    try:
+        job_ids = select_jobs(
+            request.username, request.password, request.job_ids,
+            request.name, request.states, request.partitions,
+        )
+        results = run_job_action(request.username, request.password, request.action, job_ids)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Bulk {request.action} failed: {e}")
+
+    if request.action == "cancel":
+        for result in results:
+            if result["ok"]:
+                session_registry.forget_job(result["job_id"])
+    if monitor_registry.is_registered(request.username):
+        monitor_registry.refresh(request.username)
+
+    succeeded = sum(1 for result in results if result["ok"])
+    return {
+        "action": request.action,
+        "matched": len(job_ids),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+@app.get("/history")
+def get_job_history(
+    state: Optional[str] = None,
+    partition: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
+    """The caller's finished jobs, newest first; ``since``/``until`` are epoch seconds on job end time"""
+    username = logged_in_user(authorization)
+    try:
+        return job_history.jobs(username, state, partition, since, until, min(max(limit, 1), 1000), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/history/usage")
+def get_usage(
+    group_by: str = "user",
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    authorization: Optional[str] = Header(None),
+):
+    """Per-partition usage covers the whole lab; per-user usage only the caller"""
+    username = logged_in_user(authorization)
+    try:
+        usage = job_history.usage(group_by, since, until, username if group_by == "user" else None)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"group_by": group_by, "usage": usage}
+
+@app.get("/history/wait_times")
+def get_wait_times(
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    authorization: Optional[str] = Header(None),
+):
+    logged_in_user(authorization)
+    return {"partitions": job_history.wait_times(since, until)}
+
+@app.get("/history/status")
+def get_history_status():
+    return job_history.status()
+
 @app.post("/start_monitoring")
-def start_monitoring(request: JobRequest):
-    if request.username in active_monitors:
+def start_monitoring(request: JobRequest, authorization: Optional[str] = Header(None)):
+    authenticate(request, authorization)
+    if not monitor_registry.register(request.username, request.password):
         return {"message": "Monitoring already active for this user"}
 
-    monitor = HPCJobMonitor(request.username, request.password)
-    active_monitors[request.username] = monitor
-    monitor.start_monitoring(lambda jobs: print(f"Updated jobs for {request.username}"))
-
     return {"message": "Monitoring started"}
 
-@app.get("/running_jobs/{username}")
-def get_running_jobs(username: str):
-    if username not in active_monitors:
-        raise HTTPException(status_code=404, detail="No monitoring session found for this user")
-    
-    jobs = active_monitors[username].get_current_jobs()
-    return {"jobs": jobs}
-
 @app.delete("/delete_job")
-def delete_job(request: JobCancelRequest):
-    if request.username not in active_monitors:
-        raise HTTPException(status_code=404, detail="No monitoring session found for this user")
-    
-    success = active_monitors[request.username].cancel_job(request.job_id)
+def delete_job(request: JobCancelRequest, authorization: Optional[str] = Header(None)):
+    # Cancel as the caller, never with credentials stored for monitoring
+    authenticate(request, authorization)
+    username, password = request.username, request.password
+
+    success = HPCSessionManager.cancel_job(request.job_id, username, password)
     
     if success:
+        session_registry.forget_job(request.job_id)
+        monitor_registry.refresh(username)
         return {"message": "Job deleted successfully"}
     else:
         raise HTTPException(status_code=500, detail="Failed to delete job")
\ No newline at end of file
@@ -0,0 +1,156 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket bounds in seconds, by how long the operation normally takes
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOGIN_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30)
+QUEUE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+STARTUP_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 60, 120)
+PARSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base for the three metric kinds; ``labelnames`` fixes the label order"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def _samples(self):
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.series.items())
+        ]
+
+
+class Gauge(Metric):
+    """Current value read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self.function = None
+
+    def set_function(self, function):
+        self.function = function
+
+    def _samples(self):
+        if self.function is None:
+            return []
+        try:
+            return [f"{self.name} {self.function()}"]
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} unavailable: {e}")
+            return []
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total, observed = self.series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.series[key] = (counts, total + value, observed + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block; failures are not observed"""
+        start = time.perf_counter()
+        yield
+        self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, observed) in sorted(self.series.items()):
+            # Every bound at or above a value is counted on observe, so buckets are cumulative
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {observed}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {observed}")
+        return lines
+
+
+class MetricsRegistry:
+    """Every metric of this worker process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+SSH_CONNECT_SECONDS = Histogram(
+    "hpc_ssh_connect_seconds", "Pooled SSH login, from spawn to a ready shell", LOGIN_BUCKETS
+)
+SSH_PASSWORD_PROMPT_SECONDS = Histogram(
+    "hpc_ssh_password_prompt_seconds", "Time until the login node asks for the password", LOGIN_BUCKETS
+)
+SRUN_ALLOCATION_SECONDS = Histogram(
+    "hpc_srun_allocation_seconds", "From sending srun to a shell on the compute node", QUEUE_BUCKETS
+)
+JUPYTER_TOKEN_SECONDS = Histogram(
+    "hpc_jupyter_token_seconds", "From starting Jupyter on the node to its token line", STARTUP_BUCKETS
+)
+TUNNEL_SETUP_SECONDS = Histogram(
+    "hpc_tunnel_setup_seconds", "Opening the port forward to Jupyter", FAST_BUCKETS
+)
+SQUEUE_ROUNDTRIP_SECONDS = Histogram(
+    "hpc_squeue_roundtrip_seconds", "squeue over the pooled connection", FAST_BUCKETS, ["scope"]
+)
+SQUEUE_PARSE_SECONDS = Histogram(
+    "hpc_squeue_parse_seconds", "Parsing squeue output", PARSE_BUCKETS, ["scope"]
+)
+FAILURES = Counter("hpc_failures_total", "Failed HPC operations by stage", ["stage"])
+ACTIVE_SESSIONS = Gauge("hpc_active_sessions", "Jupyter sessions registered on this worker")
+ACTIVE_TUNNELS = Gauge("hpc_active_tunnels", "Port forwards open on this worker")
+ACTIVE_MONITORS = Gauge("hpc_active_monitors", "Job monitors running on this worker")
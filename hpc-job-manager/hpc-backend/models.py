@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class HPCJob(BaseModel):
@@ -12,8 +14,9 @@ class HPCJob(BaseModel):
 
 class JobRequest(BaseModel):
     username: str
-    password: str
+    password: Optional[str] = None
 
 class JobCancelRequest(BaseModel):
     username: str
-    job_id: str
\ No newline at end of file
+    job_id: str
+    password: Optional[str] = None
\ No newline at end of file
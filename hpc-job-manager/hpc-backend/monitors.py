@@ -0,0 +1,144 @@
+import threading
+import time
+
+from config import MONITOR_SYNC_INTERVAL, MONITOR_TTL, POLL_ACTIVITY_WINDOW
+from services import HPCJobMonitor
+from state_store import leader, state_store
+
+EMPTY_STATE = {"version": 0, "jobs": [], "changes": []}
+
+
+def changes_since(state, since):
+    """Deltas after version ``since`` in a published state, or a full snapshot if they've aged out"""
+    version = state["version"]
+    changes = state["changes"]
+    oldest = changes[0]["version"] if changes else version + 1
+    if since > version or since < oldest - 1:
+        return {"version": version, "full": True, "jobs": state["jobs"]}
+    deltas = [change for change in changes if change["version"] > since]
+    return {"version": version, "full": False, "deltas": deltas}
+
+
+class MonitorRegistry:
+    """Monitored users and their job lists, shared by every worker via the state store.
+
+    Any worker registers users and answers /running_jobs from the published
+    state; only the leader runs HPCJobMonitors, so the cluster sees the same
+    squeue traffic however many workers there are. Other workers ask for a
+    refresh by leaving a nudge in the store for the leader to pick up.
+    """
+
+    def __init__(self, store=state_store, interval=MONITOR_SYNC_INTERVAL, ttl=MONITOR_TTL):
+        self.store = store
+        self.interval = interval
+        self.ttl = ttl
+        self.monitors = {}
+        self.published = {}
+        self.nudges = {}
+        self.lock = threading.Lock()
+        self.sync_thread = None
+
+    def start(self):
+        if self.sync_thread is None or not self.sync_thread.is_alive():
+            self.sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
+            self.sync_thread.start()
+
+    def register(self, username, password):
+        """Start monitoring ``username``, or renew the registration; False if they were already monitored"""
+        registered = self.is_registered(username)
+        self.store.set(
+            f"monitor:{username}", {"username": username, "password": password}, ttl=self.ttl
+        )
+        if not registered:
+            self.sync()
+        return not registered
+
+    def unregister(self, username):
+        """Stop monitoring ``username`` and forget their password"""
+        self.store.delete(f"monitor:{username}")
+        self.store.delete(f"jobs:{username}")
+
+    def is_registered(self, username):
+        return self.store.get(f"monitor:{username}") is not None
+
+    def get_state(self, username):
+        return self.store.get(f"jobs:{username}") or EMPTY_STATE
+
+    def get_snapshot(self, username):
+        state = self.get_state(username)
+        return {"version": state["version"], "jobs": state["jobs"]}
+
+    def get_changes(self, username, since):
+        return changes_since(self.get_state(username), since)
+
+    def refresh(self, username):
+        """Poll ``username``'s jobs again right away, wherever their monitor runs"""
+        self._nudge(username, 0)
+
+    def expect_activity(self, username, window=POLL_ACTIVITY_WINDOW):
+        self._nudge(username, window)
+
+    def _nudge(self, username, window):
+        with self.lock:
+            monitor = self.monitors.get(username)
+        if monitor is None:
+            self.store.set(f"nudge:{username}", {"at": time.time(), "window": window}, ttl=60)
+        elif window:
+            monitor.expect_activity(window)
+        else:
+            monitor.refresh()
+
+    def _publish(self, monitor):
+        """Update callback: write the monitor's state to the store when its version moves"""
+        if self.published.get(monitor.username) == monitor.version:
+            return
+        state = monitor.export_state()
+        self.store.set(f"jobs:{monitor.username}", state)
+        self.published[monitor.username] = state["version"]
+
+    def sync(self):
+        """Run a monitor per registered user while leader, none otherwise, and apply nudges"""
+        registered = self.store.scan("monitor:").values() if leader.is_leader else ()
+        wanted = {entry["username"]: entry["password"] for entry in registered}
+        with self.lock:
+            # A new password (or none) means the running monitor has to go
+            stale = [
+                self.monitors.pop(name) for name in list(self.monitors)
+                if wanted.get(name) != self.monitors[name].password
+            ]
+            for username, password in wanted.items():
+                if username in self.monitors:
+                    continue
+                monitor = HPCJobMonitor(username, password)
+                state = self.store.get(f"jobs:{username}")
+                if state:
+                    monitor.restore_state(state)
+                self.published[username] = monitor.version
+                self.monitors[username] = monitor
+                monitor.start_monitoring(lambda jobs, monitor=monitor: self._publish(monitor))
+                print(f"👀 Monitoring jobs for {username}")
+            monitors = dict(self.monitors)
+        for monitor in stale:
+            monitor.stop_monitoring()
+
+        if not monitors:
+            return
+        for key, nudge in self.store.scan("nudge:").items():
+            username = key[len("nudge:"):]
+            if username in monitors and nudge["at"] > self.nudges.get(username, 0):
+                self.nudges[username] = nudge["at"]
+                if nudge["window"]:
+                    monitors[username].expect_activity(nudge["window"])
+                else:
+                    monitors[username].refresh()
+
+    def _sync_loop(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Monitor sync error: {e}")
+            time.sleep(self.interval)
+
+
+monitor_registry = MonitorRegistry()
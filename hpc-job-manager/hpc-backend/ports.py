@@ -0,0 +1,52 @@
+import socket
+import threading
+import time
+
+from config import LOCAL_PORT_END, LOCAL_PORT_START
+
+
+class PortRegistry:
+    """Leases free local ports to sessions and recycles them when sessions end.
+
+    A port is only handed out if nothing else holds a lease on it and it can
+    actually be bound on 127.0.0.1 right now.
+    """
+
+    def __init__(self, start=LOCAL_PORT_START, end=LOCAL_PORT_END):
+        self.start = start
+        self.end = end
+        self.leases = {}
+        self.lock = threading.Lock()
+        self.next_port = start
+
+    def lease(self, owner):
+        """Reserve a free port for ``owner``; raises RuntimeError if the range is exhausted"""
+        with self.lock:
+            span = self.end - self.start + 1
+            for _ in range(span):
+                port = self.next_port
+                self.next_port = self.start + (port - self.start + 1) % span
+                if port not in self.leases and self._is_free(port):
+                    self.leases[port] = {"owner": owner, "leased_at": time.time()}
+                    return port
+        raise RuntimeError(f"No free local ports in {self.start}-{self.end}")
+
+    def release(self, port):
+        with self.lock:
+            self.leases.pop(port, None)
+
+    def list(self):
+        with self.lock:
+            return [{"port": port, **lease} for port, lease in sorted(self.leases.items())]
+
+    @staticmethod
+    def _is_free(port):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind(("127.0.0.1", port))
+                return True
+            except OSError:
+                return False
+
+
+port_registry = PortRegistry()
@@ -1,13 +1,70 @@
-from pydantic import BaseModel
+from typing import List, Optional
 
-class HPCJobRequest(BaseModel):
+from pydantic import BaseModel, Field
+
+class LoginRequest(BaseModel):
     username: str
     password: str
+
+class HPCJobRequest(BaseModel):
+    username: str
+    password: Optional[str] = None
     use_gpu: bool
     cpu_time: str
-    num_nodes: int
-    num_tasks: int
+    num_nodes: int = Field(ge=1)
+    num_tasks: int = Field(ge=1)
 
 class HPCJobResponse(BaseModel):
     status: str
-    jupyter_url: str
+    launch_id: Optional[str] = None
+    jupyter_url: Optional[str] = None
+
+class BatchJob(BaseModel):
+    """One sbatch submission; unset resource fields fall back to the request's"""
+    name: Optional[str] = None
+    command: Optional[str] = None
+    script: Optional[str] = None
+    array: Optional[str] = None
+    dependency: Optional[str] = None
+    output: Optional[str] = None
+    use_gpu: Optional[bool] = None
+    cpu_time: Optional[str] = None
+    num_nodes: Optional[int] = Field(None, ge=1)
+    num_tasks: Optional[int] = Field(None, ge=1)
+
+class BatchJobRequest(BaseModel):
+    username: str
+    password: Optional[str] = None
+    use_gpu: bool = False
+    cpu_time: str = "01:00:00"
+    num_nodes: int = Field(1, ge=1)
+    num_tasks: int = Field(1, ge=1)
+    name: str = "batch"
+    jobs: List[BatchJob]
+
+class BatchJobResult(BaseModel):
+    index: int
+    name: str
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchJobResponse(BaseModel):
+    status: str
+    results: List[BatchJobResult]
+
+class BulkJobRequest(BaseModel):
+    """Jobs to act on: explicit IDs and/or filters (name glob, states, partitions)"""
+    username: str
+    password: Optional[str] = None
+    action: str
+    job_ids: List[str] = []
+    name: Optional[str] = None
+    states: List[str] = []
+    partitions: List[str] = []
+
+class WaitEstimateRequest(BaseModel):
+    username: str
+    password: Optional[str] = None
+    use_gpu: bool = False
+    num_nodes: int = Field(1, ge=1)
+    num_tasks: int = Field(1, ge=1)
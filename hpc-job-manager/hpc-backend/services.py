@@ -1,31 +1,164 @@
-import random
 import re
+import select
+import shlex
 import signal
 import sys
 import threading
 import time
+from collections import defaultdict, deque
 
 import pexpect
 
+from config import (
+    ALLOCATION_TIMEOUT,
+    CPU_PARTITION,
+    GPU_PARTITION,
+    HPC_HOST,
+    JUPYTER_BASE_PORT,
+    JUPYTER_JOB_PREFIX,
+    JUPYTER_TIMEOUT,
+    MONITOR_CHANGE_HISTORY,
+    MONITOR_MODE,
+    MONITOR_PARTITIONS,
+    POLL_ACTIVITY_WINDOW,
+    POLL_BASE,
+    POLL_FAST,
+    POLL_MAX,
+    SERVICE_PASSWORD,
+    SERVICE_USER,
+)
+from metrics import (
+    FAILURES,
+    JUPYTER_TOKEN_SECONDS,
+    SQUEUE_PARSE_SECONDS,
+    SQUEUE_ROUNDTRIP_SECONDS,
+    SRUN_ALLOCATION_SECONDS,
+    TUNNEL_SETUP_SECONDS,
+)
+from job_actions import JOB_ID_PATTERN
+from ports import port_registry
+from squeue import SQUEUE_FORMAT, SqueueJob, diff_jobs, parse_squeue_output
+from ssh_pool import LOGIN_PROMPT, ssh_pool
+from tunnels import tunnel_manager
+
+LOGIN_HOSTNAME = HPC_HOST.split(".")[0]
+NODE_PROMPT = r"\[[^@\]\s]+@([\w.-]+) [^\]]*\]\$"
+# Job states that are about to change, so the monitor polls fast while they're present
+TRANSITIONAL_STATES = {"PENDING", "CONFIGURING", "COMPLETING"}
+# CPUs Slurm allocates per task for every launch
+CPUS_PER_TASK = 4
+# A cluster-wide squeue needs an account that can see everyone's jobs; under a
+# student's login (Slurm PrivateData) the others would silently get empty lists
+SHARED_POLLING = MONITOR_MODE == "shared" and bool(SERVICE_USER)
+if MONITOR_MODE == "shared" and not SERVICE_USER:
+    print("⚠️ HPC_MONITOR_MODE=shared needs HPC_SERVICE_USER; polling per user instead")
+
+
+PROFILE_PATTERN = re.compile(r"(cpu|gpu)-(\d+)x(\d+)$")
+
+
+def session_profile(use_gpu, num_nodes, num_tasks):
+    """Short name for a launch's resource shape, e.g. ``gpu-1x4``"""
+    return f"{'gpu' if use_gpu else 'cpu'}-{num_nodes}x{num_tasks}"
+
+
+def partition_for(use_gpu):
+    """Partition a launch goes to; "" means the cluster's default partition"""
+    return GPU_PARTITION if use_gpu else CPU_PARTITION
+
+
+def parse_profile(profile):
+    """Inverse of session_profile: ``gpu-1x4`` -> (True, 1, 4)"""
+    match = PROFILE_PATTERN.match(profile)
+    if not match:
+        raise ValueError(f"Invalid session profile: {profile}")
+    return match.group(1) == "gpu", int(match.group(2)), int(match.group(3))
+
+
+class SessionKeeper:
+    """Drains output from every live interactive session on a single thread.
+
+    Jupyter keeps logging to the session's pty; if nothing reads it the buffer
+    fills and Jupyter blocks, so each session used to need its own spinning
+    keep-alive thread.
+    """
+
+    def __init__(self):
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.drain_thread = None
+
+    def add(self, session):
+        with self.lock:
+            self.sessions.add(session)
+            if self.drain_thread is None or not self.drain_thread.is_alive():
+                self.drain_thread = threading.Thread(target=self._drain, daemon=True)
+                self.drain_thread.start()
+
+    def discard(self, session):
+        with self.lock:
+            self.sessions.discard(session)
+
+    def _drain(self):
+        while True:
+            with self.lock:
+                sessions = {s.child_fd: s for s in self.sessions if not s.closed}
+                if not sessions:
+                    self.drain_thread = None
+                    return
+            try:
+                readable, _, _ = select.select(list(sessions), [], [], 1.0)
+            except (OSError, ValueError):
+                # A session was closed between the snapshot and select()
+                continue
+            for fd in readable:
+                session = sessions[fd]
+                try:
+                    session.read_nonblocking(65536, timeout=0)
+                except pexpect.TIMEOUT:
+                    pass
+                except (pexpect.EOF, OSError, ValueError):
+                    self.discard(session)
+
+
+session_keeper = SessionKeeper()
+
 
 class HPCSessionManager:
-    def __init__(self, username, password, use_gpu, cpu_time, num_nodes, num_tasks):
+    def __init__(
+        self, username, password, use_gpu, cpu_time, num_nodes, num_tasks, on_progress=None
+    ):
         self.username = username
         self.password = password
         self.use_gpu = use_gpu
         self.cpu_time = cpu_time
         self.num_nodes = num_nodes
         self.num_tasks = num_tasks
-        self.port = random.randint(10000, 63999)
+        self.profile = session_profile(use_gpu, num_nodes, num_tasks)
+        # Local end of the tunnel; Jupyter picks its own port on the node
+        self.port = port_registry.lease(owner=username)
+        self.port_leased = True
+        self.remote_port = None
         self.node_name = None
+        self.token = None
         self.jupyter_url = None
         self.session = None
         self.tunnel = None
         self.running = True
+        self.slurm_job_id = None
         self.jupyter_ready = threading.Event()
+        self.on_progress = on_progress
+
+        # Signal handlers can only be installed from the main thread; background
+        # launches are cleaned up by their owner instead.
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.signal_handler)
+            signal.signal(signal.SIGTERM, self.signal_handler)
 
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+    def report(self, stage, **data):
+        """Forward a launch progress event to the on_progress callback, if any"""
+        if self.on_progress:
+            self.on_progress(stage, **data)
 
     def signal_handler(self, signum, frame):
         """Handle cleanup on shutdown signals"""
@@ -37,178 +170,185 @@ class HPCSessionManager:
     def cleanup(self):
         """Clean up resources"""
         if self.session:
+            session_keeper.discard(self.session)
             self.session.close()
         if self.tunnel:
-            self.tunnel.close()
+            tunnel_manager.close(self.tunnel.local_port)
+            self.tunnel = None
+        if self.port_leased:
+            port_registry.release(self.port)
+            self.port_leased = False
 
     def request_interactive_session(self):
         """Logs into HPC, requests a node, and starts Jupyter Notebook."""
-        command = f"srun --ntasks={self.num_tasks} --nodes={self.num_nodes} --cpus-per-task=4 --time={self.cpu_time} --pty /bin/bash"
+        partition = f"-p {partition_for(self.use_gpu)} " if partition_for(self.use_gpu) else ""
+        if self.use_gpu:
+            partition += "--gres=gpu "
+        command = (
+            f"srun {partition}--job-name={JUPYTER_JOB_PREFIX}-{self.profile} --ntasks={self.num_tasks} "
+            f"--nodes={self.num_nodes} --cpus-per-task={CPUS_PER_TASK} --time={self.cpu_time} --pty /bin/bash"
+        )
 
         try:
             print("🔗 Connecting to HPC and requesting a node...")
-            self.session = pexpect.spawn(
-                f"ssh {self.username}@coe-hpc1.sjsu.edu", timeout=30
-            )
-
-            index = self.session.expect(["Password:", pexpect.EOF, pexpect.TIMEOUT])
-            if index == 0:
-                self.session.sendline(self.password)
-            elif index == 1:
-                raise Exception("Unexpected EOF received during SSH")
-            elif index == 2:
-                raise Exception("SSH connection timed out")
-
-            self.session.expect(r"\[.*@.* ~\]\$", timeout=30)
+            # New channel over the user's pooled master: no handshake or password prompt
+            self.session = ssh_pool.get(self.username, self.password).spawn()
+            self.session.expect(LOGIN_PROMPT, timeout=30)
             print("✔ Successfully connected to HPC.")
+            self.report("connected")
             self.session.sendline(command)
-            time.sleep(5)
-
-            print("🔄 Checking allocated node...")
-            self.session.sendline("echo $SHELL")
-            self.session.expect(r"\[.*@.* ~\]\$", timeout=20)
-
-            shell_output = self.session.before.decode()
-            raw_prompt = self.session.after.decode()
-
-            print(f"Shell output: {shell_output}")
-            print(f"Detected prompt: {raw_prompt}")
-
-            self.session.sendline("hostname")
-            self.session.expect(r"(\w+)", timeout=20)
 
-            match = re.search(r"@(\w+)", raw_prompt)
-            if match:
-                self.node_name = match.group(1)
-                if self.node_name != "coe-hpc1":
-                    print(f"Interactive session allocated. Node: {self.node_name}")
-                else:
-                    print("Still on the login node.")
-            else:
-                print("No valid node prompt detected.")
-
-            if self.node_name == "coe-hpc1":
-                print("❌ Error: Allocation failed. Still on the login node.")
+            print("🔄 Waiting for node allocation...")
+            start = time.perf_counter()
+            if not self.wait_for_allocation():
+                FAILURES.inc(stage="allocation")
                 return False, None
+            SRUN_ALLOCATION_SECONDS.observe(time.perf_counter() - start)
 
-            time.sleep(5)
             print(f"🚀 Starting Jupyter Notebook on {self.node_name}...")
             self.session.sendline(
-                f"module load python3; jupyter notebook --no-browser --port={self.port}"
+                # Listen beyond localhost so the login node can forward to it
+                f"module load python3; jupyter notebook --no-browser --ip=0.0.0.0 "
+                f"--port={JUPYTER_BASE_PORT} --port-retries=100"
             )
+            start = time.perf_counter()
 
             # Look for Jupyter URL pattern
             index = self.session.expect(
                 [
-                    r"http://localhost:\d+/\?token=([\w\d]+)",
+                    r"https?://[^\s:/]+:(\d+)/\S*\?token=([\w\d]+)",
                     r"token=([\w\d]+)",
                     pexpect.TIMEOUT,
+                    pexpect.EOF,
                 ],
-                timeout=30,
+                timeout=JUPYTER_TIMEOUT,
             )
 
             if index in [0, 1]:
-                token = self.session.match.group(1).decode()
-                self.jupyter_url = f"http://127.0.0.1:{self.port}/?token={token}"
+                if index == 0:
+                    self.remote_port = int(self.session.match.group(1))
+                    self.token = self.session.match.group(2).decode()
+                else:
+                    self.remote_port = JUPYTER_BASE_PORT
+                    self.token = self.session.match.group(1).decode()
+                self.jupyter_url = f"http://127.0.0.1:{self.port}/?token={self.token}"
+                JUPYTER_TOKEN_SECONDS.observe(time.perf_counter() - start)
                 print(f"✨ Jupyter URL: {self.jupyter_url}")
+                self.report("jupyter_ready", jupyter_url=self.jupyter_url)
                 self.jupyter_ready.set()
             else:
                 print("❌ Failed to get Jupyter token")
+                FAILURES.inc(stage="jupyter")
                 return False, None
 
-            # Keep the session alive
-            while self.running:
-                self.session.expect([pexpect.TIMEOUT, pexpect.EOF], timeout=30)
-                if not self.running:
-                    break
-                time.sleep(1)
-
+            # Hand the session to the shared keeper so Jupyter's output keeps draining
+            session_keeper.add(self.session)
             return True, self.jupyter_url
 
         except Exception as e:
             print(f"❌ Error: {e}")
+            FAILURES.inc(stage="session")
             return False, None
 
-    def setup_ssh_tunnel(self):
-        """Sets up a persistent SSH tunnel."""
-        try:
-            print("🔗 Setting up SSH tunnel to login node...")
-            self.tunnel = pexpect.spawn(
-                f"ssh -L {self.port}:localhost:{self.port} {self.username}@coe-hpc1.sjsu.edu",
-                timeout=30,
-            )
-
-            self.tunnel.expect(r"Password:")
-            self.tunnel.sendline(self.password)
-            self.tunnel.expect(r"\[.*@.* ~\]\$", timeout=30)
-            print("✔ Connected to login node.")
-
-            print(f"🔗 Forwarding port to compute node: {self.node_name}...")
-            self.tunnel.sendline(
-                f"ssh -L {self.port}:localhost:{self.port} {self.username}@{self.node_name}"
+    def wait_for_allocation(self):
+        """Follow srun's output until the compute-node prompt appears or the deadline passes."""
+        deadline = time.time() + ALLOCATION_TIMEOUT
+        while True:
+            index = self.session.expect(
+                [
+                    r"job (\d+) queued and waiting for resources",
+                    r"job (\d+) has been allocated resources",
+                    r"srun: error: ([^\r\n]*)",
+                    NODE_PROMPT,
+                    pexpect.TIMEOUT,
+                    pexpect.EOF,
+                ],
+                timeout=max(deadline - time.time(), 0),
             )
-            self.tunnel.expect(r"\[.*@.* ~\]\$", timeout=30)
-            print(f"✔ SSH tunnel established to {self.node_name}")
-
-            # Keep the tunnel alive
-            while self.running:
-                self.tunnel.expect([pexpect.TIMEOUT, pexpect.EOF], timeout=30)
-                if not self.running:
-                    break
-                time.sleep(1)
+            if index == 0:
+                self.slurm_job_id = self.session.match.group(1).decode()
+                print(f"⏳ Job {self.slurm_job_id} queued, waiting for resources...")
+                self.report("queued_in_slurm", job_id=self.slurm_job_id)
+            elif index == 1:
+                self.slurm_job_id = self.session.match.group(1).decode()
+            elif index == 2:
+                print(f"❌ srun error: {self.session.match.group(1).decode()}")
+                return False
+            elif index == 3:
+                node_name = self.session.match.group(1).decode()
+                if node_name == LOGIN_HOSTNAME:
+                    print("❌ Error: Allocation failed. Still on the login node.")
+                    return False
+                self.node_name = node_name
+                print(f"Interactive session allocated. Node: {self.node_name}")
+                self.report("allocated", node=self.node_name, job_id=self.slurm_job_id)
+                return True
+            elif index == 4:
+                print(f"❌ Timed out after {ALLOCATION_TIMEOUT}s waiting for allocation")
+                return False
+            else:
+                print("❌ Session closed while waiting for allocation")
+                return False
 
-            return True
-        except Exception as e:
-            print(f"❌ SSH Tunnel Error: {e}")
+    def setup_ssh_tunnel(self):
+        """Forwards the local port to Jupyter on the compute node over the pooled connection."""
+        print(f"🔗 Forwarding port {self.port} to {self.node_name}:{self.remote_port}...")
+        start = time.perf_counter()
+        self.tunnel = tunnel_manager.open(
+            self.username, self.password, self.port, self.node_name, self.remote_port
+        )
+        if self.tunnel is None:
+            FAILURES.inc(stage="tunnel")
             return False
+        TUNNEL_SETUP_SECONDS.observe(time.perf_counter() - start)
+        print(f"✔ SSH tunnel established to {self.node_name}")
+        self.report("tunnel_up", port=self.port)
+        return True
 
     def start(self):
-        """Handles the entire flow in separate threads."""
-
-        def session_wrapper():
-            success, jupyter_url = self.request_interactive_session()
+        """Runs the whole launch on the calling thread and returns (success, jupyter_url)."""
+        try:
+            success, _ = self.request_interactive_session()
             if not success:
                 print("❌ Failed to start Jupyter Notebook.")
-                self.running = False
-
-        def tunnel_wrapper():
-            success = self.setup_ssh_tunnel()
-            if not success:
+            elif not self.setup_ssh_tunnel():
                 print("❌ Failed to establish SSH tunnel.")
-                self.running = False
-
-        # Create threads for session and SSH tunnel setup
-        session_thread = threading.Thread(target=session_wrapper, daemon=True)
-        session_thread.start()
-
-        # Wait for initial setup to complete
-        time.sleep(10)
-
-        # Proceed to tunnel setup if the session was successful
-        if self.node_name:
-            tunnel_thread = threading.Thread(target=tunnel_wrapper, daemon=True)
-            tunnel_thread.start()
-
-            try:
-                # Wait for Jupyter URL to be ready
-                if self.jupyter_ready.wait(
-                    timeout=60
-                ):  # Wait up to 60 seconds for Jupyter to start
-                    print(f"🎉 Setup complete! Jupyter URL: {self.jupyter_url}")
-                    return True, self.jupyter_url
-                else:
-                    print("❌ Timeout waiting for Jupyter URL")
-                    return False, None
+            else:
+                print(f"🎉 Setup complete! Jupyter URL: {self.jupyter_url}")
+                return True, self.jupyter_url
 
-            except KeyboardInterrupt:
-                self.signal_handler(signal.SIGINT, None)
+        except KeyboardInterrupt:
+            self.signal_handler(signal.SIGINT, None)
 
+        self.running = False
+        self.cleanup()
         return False, None
 
+    def is_alive(self):
+        """True while the srun shell holding the allocation is still open"""
+        return self.running and self.session is not None and self.session.isalive()
+
     def get_jupyter_url(self):
         """Get the current Jupyter URL."""
         return self.jupyter_url if self.jupyter_ready.is_set() else None
 
+    @staticmethod
+    def cancel_job(job_id, username, password):
+        """Cancel a job over the user's pooled connection."""
+        # The pooled shell outlives this command, so nothing but a job ID may reach it
+        if not JOB_ID_PATTERN.match(str(job_id)):
+            print(f"Refusing to cancel invalid job ID {job_id!r}")
+            return False
+        try:
+            output = ssh_pool.run(username, password, f"scancel {shlex.quote(str(job_id))}")
+            if "error" in output.lower():
+                print(f"Error canceling job {job_id}: {output.strip()}")
+                return False
+            return True
+        except Exception as e:
+            print(f"Error canceling job {job_id}: {e}")
+            return False
+
 
 class HPCJobMonitor:
     def __init__(self, username, password):
@@ -217,94 +357,190 @@ class HPCJobMonitor:
         self.running = True
         self.jobs = []
         self.jobs_lock = threading.Lock()
+        self.version = 0
+        self.changes = deque(maxlen=MONITOR_CHANGE_HISTORY)
+        self.interval = POLL_FAST
+        self.fast_until = 0
+        self.wake = threading.Event()
         self.monitor_thread = None
         self.callback = None
 
     def start_monitoring(self, update_callback):
-        """Start background job monitoring thread"""
+        """Start background job monitoring (own thread, or the shared cluster poller)"""
         self.callback = update_callback
+        if SHARED_POLLING:
+            cluster_poller.register(self)
+            return
         self.monitor_thread = threading.Thread(target=self._monitor_jobs, daemon=True)
         self.monitor_thread.start()
 
     def stop_monitoring(self):
         """Stop the monitoring thread"""
         self.running = False
+        self.wake.set()
+        if SHARED_POLLING:
+            cluster_poller.unregister(self.username)
         if self.monitor_thread:
             self.monitor_thread.join()
 
+    def update_jobs(self, current_jobs):
+        """Store a fresh job list, record its delta and notify the callback"""
+        with self.jobs_lock:
+            delta = diff_jobs(self.jobs, current_jobs)
+            changed = any(delta.values())
+            if changed:
+                self.version += 1
+                self.changes.append({"version": self.version, **delta})
+            self.jobs = current_jobs.copy()
+            self.interval = self._next_interval(changed)
+        if self.callback:
+            self.callback(current_jobs)
+
+    def _next_interval(self, changed):
+        """Poll fast while something is about to change, back off while nothing does"""
+        if time.time() < self.fast_until or any(
+            job.status in TRANSITIONAL_STATES for job in self.jobs
+        ):
+            return POLL_FAST
+        if changed and self.jobs:
+            return POLL_BASE
+        return min(max(self.interval * 2, POLL_BASE), POLL_MAX)
+
+    def expect_activity(self, window=POLL_ACTIVITY_WINDOW):
+        """Poll fast for a while, e.g. while a launch for this user is in flight"""
+        self.fast_until = time.time() + window
+        self.interval = POLL_FAST
+        self.refresh()
+
+    def refresh(self):
+        """Poll again right away instead of waiting out the current interval"""
+        if SHARED_POLLING:
+            cluster_poller.wake.set()
+        else:
+            self.wake.set()
+
     def _monitor_jobs(self):
         """Background thread that periodically checks for running jobs"""
         while self.running:
             try:
                 current_jobs = self._fetch_jobs()
-                with self.jobs_lock:
-                    self.jobs = current_jobs.copy()
-                if self.callback:
-                    self.callback(current_jobs)
+                if current_jobs is not None:
+                    self.update_jobs(current_jobs)
             except Exception as e:
                 print(f"Job monitoring error: {e}")
-            time.sleep(30)  # Update every 30 seconds
+            self.wake.wait(self.interval)
+            self.wake.clear()
 
     def _fetch_jobs(self):
-        """Connect to HPC and fetch running jobs"""
+        """Fetch running jobs over the user's pooled connection"""
         try:
-            session = pexpect.spawn(
-                f"ssh {self.username}@coe-hpc1.sjsu.edu", timeout=30
-            )
-            session.expect("Password:")
-            session.sendline(self.password)
-            session.expect(r"\[.*@.* ~\]\$", timeout=30)
-
-            session.sendline(f"squeue -u {self.username} --Format=JobID:10,Partition:10,Name:30,User:10,State:10,TimeUsed:10,NNodes:10,NodeList:30")
-            session.expect(r"\[.*@.* ~\]\$", timeout=30)
-
-            output = session.before.decode().split("\n")
-            jobs = []
-
-            # Skip header line and process job entries
-            for line in output[1:]:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 8:
-                        job = {
-                            "job_id": parts[0],
-                            "partition": parts[1],
-                            "name": parts[2],
-                            "user": parts[3],
-                            "status": parts[4],
-                            "time": parts[5],
-                            "nodes": parts[6],
-                            "nodelist": parts[7],
-                        }
-                        jobs.append(job)
-
-            session.close()
-            return jobs
+            with SQUEUE_ROUNDTRIP_SECONDS.time(scope="user"):
+                output = ssh_pool.run(
+                    self.username,
+                    self.password,
+                    f"squeue -u {shlex.quote(self.username)} {SQUEUE_FORMAT}",
+                )
+            with SQUEUE_PARSE_SECONDS.time(scope="user"):
+                return parse_squeue_output(output)
 
         except Exception as e:
+            # None (not []) so a failed poll isn't mistaken for every job ending
             print(f"Error fetching jobs: {e}")
-            return []
+            FAILURES.inc(stage="squeue")
+            return None
 
     def cancel_job(self, job_id):
         """Cancel a specific job"""
-        try:
-            session = pexpect.spawn(
-                f"ssh {self.username}@coe-hpc1.sjsu.edu", timeout=30
-            )
-            session.expect("Password:")
-            session.sendline(self.password)
-            session.expect(r"\[.*@.* ~\]\$", timeout=30)
-
-            session.sendline(f"scancel {job_id}")
-            session.expect(r"\[.*@.* ~\]\$", timeout=30)
-            session.close()
-
-            return True
-        except Exception as e:
-            print(f"Error canceling job {job_id}: {e}")
-            return False
+        success = HPCSessionManager.cancel_job(job_id, self.username, self.password)
+        if success:
+            self.refresh()
+        return success
 
     def get_current_jobs(self):
         """Return the current list of jobs"""
         with self.jobs_lock:
-            return self.jobs.copy()
+            return [job.to_dict() for job in self.jobs]
+
+    def export_state(self):
+        """Version, jobs and recent deltas, for publishing to other workers"""
+        with self.jobs_lock:
+            return {
+                "version": self.version,
+                "jobs": [job.to_dict() for job in self.jobs],
+                "changes": list(self.changes),
+            }
+
+    def restore_state(self, state):
+        """Continue from a state another worker published, so versions keep counting up"""
+        with self.jobs_lock:
+            self.version = state["version"]
+            self.jobs = [SqueueJob(**job) for job in state["jobs"]]
+            self.changes.extend(state["changes"])
+
+
+class ClusterJobPoller:
+    """Runs one cluster-wide squeue per cycle and fans the rows out to every monitor"""
+
+    def __init__(self, partitions=MONITOR_PARTITIONS):
+        self.partitions = partitions
+        self.monitors = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.poll_thread = None
+
+    def register(self, monitor):
+        with self.lock:
+            self.monitors[monitor.username] = monitor
+            if self.poll_thread is None or not self.poll_thread.is_alive():
+                self.poll_thread = threading.Thread(target=self._poll, daemon=True)
+                self.poll_thread.start()
+
+    def unregister(self, username):
+        with self.lock:
+            self.monitors.pop(username, None)
+
+    def _fetch_all_jobs(self):
+        """Fetch every user's jobs, one squeue per partition (or one overall), as the service account"""
+        username, password = SERVICE_USER, SERVICE_PASSWORD
+
+        if self.partitions:
+            commands = [f"squeue --all -p {p} {SQUEUE_FORMAT}" for p in self.partitions]
+        else:
+            commands = [f"squeue --all {SQUEUE_FORMAT}"]
+
+        jobs_by_user = defaultdict(list)
+        for command in commands:
+            try:
+                with SQUEUE_ROUNDTRIP_SECONDS.time(scope="cluster"):
+                    output = ssh_pool.run(username, password, command)
+            except Exception:
+                FAILURES.inc(stage="squeue")
+                raise
+            with SQUEUE_PARSE_SECONDS.time(scope="cluster"):
+                jobs = parse_squeue_output(output)
+            for job in jobs:
+                jobs_by_user[job.user].append(job)
+        return jobs_by_user
+
+    def _poll(self):
+        """Background thread that refreshes all registered monitors each cycle"""
+        while True:
+            with self.lock:
+                if not self.monitors:
+                    self.poll_thread = None
+                    return
+            with self.lock:
+                monitors = list(self.monitors.values())
+            try:
+                jobs_by_user = self._fetch_all_jobs()
+                if jobs_by_user is not None:
+                    for monitor in monitors:
+                        monitor.update_jobs(jobs_by_user.get(monitor.username, []))
+            except Exception as e:
+                print(f"Cluster job polling error: {e}")
+            # The busiest user sets the pace for everyone
+            self.wake.wait(min((monitor.interval for monitor in monitors), default=POLL_BASE))
+            self.wake.clear()
+
+
+cluster_poller = ClusterJobPoller()
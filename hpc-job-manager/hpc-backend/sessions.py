@@ -0,0 +1,221 @@
+import json
+import re
+import shlex
+import threading
+import time
+
+from config import JUPYTER_JOB_PREFIX
+from ports import port_registry
+from ssh_pool import ssh_pool
+from tunnels import tunnel_manager
+
+NODE_MARKER = re.compile(r"NODE=(\S+)")
+PIDS_MARKER = re.compile(r"PIDS=([\d,]*)")
+# Runs inside the allocation: the node's name, the user's Jupyter processes on
+# it, and the runtime files from the shared $HOME, which cover every node
+JUPYTER_LIST_COMMAND = (
+    "echo NODE=$(hostname -s); echo PIDS=$(pgrep -u $(id -u) -d, -f jupyter); "
+    "module load python3 >/dev/null 2>&1; jupyter notebook list --json"
+)
+# Addresses a server started with --ip=0.0.0.0 (or left local) records as its host
+WILDCARD_HOSTS = {"", "0.0.0.0", "localhost", "127.0.0.1"}
+
+
+def servers_on_node(listing):
+    """(node, [(port, token)]) for the servers in ``listing`` that run on the node it came from"""
+    node = NODE_MARKER.search(listing)
+    if not node:
+        return None, []
+    node = node.group(1)
+    pids = PIDS_MARKER.search(listing)
+    pids = set(pids.group(1).split(",")) if pids else set()
+    servers = []
+    for line in listing.splitlines():
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            server = json.loads(line)
+        except ValueError:
+            continue
+        host = server.get("hostname") or ""
+        if host not in WILDCARD_HOSTS and host.split(".")[0] != node:
+            continue
+        # Another node's server can still have a wildcard host; only its PID tells
+        if str(server.get("pid")) not in pids:
+            continue
+        servers.append((int(server["port"]), server["token"]))
+    return node, servers
+
+
+class JupyterSession:
+    """A running Jupyter allocation and the tunnel that reaches it"""
+
+    def __init__(
+        self, username, password, profile, slurm_job_id, node, remote_port, token,
+        local_port, tunnel=None, manager=None,
+    ):
+        self.username = username
+        self.password = password
+        self.profile = profile
+        self.slurm_job_id = slurm_job_id
+        self.node = node
+        self.remote_port = remote_port
+        self.token = token
+        self.local_port = local_port
+        self.tunnel = tunnel
+        # The HPCSessionManager that launched it, or None if it was rediscovered
+        self.manager = manager
+        self.created_at = time.time()
+
+    @property
+    def jupyter_url(self):
+        return f"http://127.0.0.1:{self.local_port}/?token={self.token}"
+
+    def to_dict(self):
+        # No token here: the listing endpoint isn't authenticated
+        return {
+            "username": self.username,
+            "profile": self.profile,
+            "slurm_job_id": self.slurm_job_id,
+            "node": self.node,
+            "remote_port": self.remote_port,
+            "local_port": self.local_port,
+            "reattached": self.manager is None,
+            "created_at": self.created_at,
+        }
+
+    def is_healthy(self):
+        """Cheap local checks first; rediscovered sessions also ask squeue"""
+        if self.tunnel is None or not tunnel_manager.is_listening(self.local_port):
+            return False
+        if self.manager is not None:
+            return self.manager.is_alive()
+        try:
+            output = ssh_pool.run(
+                self.username, self.password,
+                f"squeue -h -j {self.slurm_job_id} -o %T", timeout=10,
+            )
+        except Exception as e:
+            print(f"⚠️ Could not check job {self.slurm_job_id}: {e}")
+            return False
+        return output.strip() == "RUNNING"
+
+    def close(self):
+        if self.manager is not None:
+            self.manager.running = False
+            self.manager.cleanup()
+            return
+        if self.tunnel:
+            tunnel_manager.close(self.local_port)
+            self.tunnel = None
+        port_registry.release(self.local_port)
+
+
+class SessionRegistry:
+    """Live Jupyter sessions keyed by (username, profile).
+
+    A second launch for the same user and resource shape gets the existing URL
+    back instead of a new allocation, and after a backend restart sessions are
+    found again through their Slurm job name and ``jupyter notebook list``.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def register(self, manager):
+        """Track a session launched by an HPCSessionManager on this worker"""
+        session = JupyterSession(
+            manager.username, manager.password, manager.profile,
+            manager.slurm_job_id, manager.node_name, manager.remote_port, manager.token,
+            manager.port, tunnel=manager.tunnel, manager=manager,
+        )
+        self._store(session)
+        return session
+
+    def add(self, session):
+        """Track a session reached through its own tunnel (a warm session held elsewhere)"""
+        self._store(session)
+
+    def find(self, username, password, profile):
+        """Return the user's healthy session for this profile, dropping it if it has died"""
+        with self.lock:
+            session = self.sessions.get((username, profile))
+        if session is None or session.password != password:
+            return None
+        if session.is_healthy():
+            return session
+
+        print(f"🧹 Dropping dead {profile} session for {username} (job {session.slurm_job_id})")
+        self._remove(session)
+        session.close()
+        return None
+
+    def reattach(self, username, password, profile):
+        """Look for a running Jupyter job from an earlier launch and tunnel to it again"""
+        job_name = f"{JUPYTER_JOB_PREFIX}-{profile}"
+        output = ssh_pool.run(
+            username, password, f"squeue -u {shlex.quote(username)} -h -t RUNNING -n {job_name} -o %i"
+        )
+        for slurm_job_id in output.split():
+            if not slurm_job_id.isdigit():
+                continue
+            # Step into the allocation on its first node, where Jupyter was started
+            listing = ssh_pool.run(
+                username, password,
+                f"srun --jobid={slurm_job_id} --overlap -N1 -n1 bash -lc '{JUPYTER_LIST_COMMAND}'",
+                timeout=30,
+            )
+            node, servers = servers_on_node(listing)
+            if not servers:
+                continue
+
+            local_port = port_registry.lease(owner=username)
+            remote_port, token = servers[0]
+            tunnel = tunnel_manager.open(username, password, local_port, node, remote_port)
+            if tunnel is None:
+                port_registry.release(local_port)
+                continue
+
+            session = JupyterSession(
+                username, password, profile, slurm_job_id, node, remote_port,
+                token, local_port, tunnel=tunnel,
+            )
+            self._store(session)
+            print(f"♻️ Reattached to Jupyter in job {slurm_job_id} on {session.node}")
+            return session
+        return None
+
+    def forget_job(self, slurm_job_id):
+        """Drop and close the session for a job that has been cancelled"""
+        with self.lock:
+            matches = [s for s in self.sessions.values() if s.slurm_job_id == str(slurm_job_id)]
+            for session in matches:
+                del self.sessions[(session.username, session.profile)]
+        for session in matches:
+            session.close()
+
+    def list(self, username=None):
+        with self.lock:
+            return [
+                session.to_dict()
+                for session in self.sessions.values()
+                if username is None or session.username == username
+            ]
+
+    def _store(self, session):
+        with self.lock:
+            previous = self.sessions.get((session.username, session.profile))
+            self.sessions[(session.username, session.profile)] = session
+        if previous is not None and previous is not session:
+            previous.close()
+
+    def _remove(self, session):
+        with self.lock:
+            key = (session.username, session.profile)
+            if self.sessions.get(key) is session:
+                del self.sessions[key]
+
+
+session_registry = SessionRegistry()
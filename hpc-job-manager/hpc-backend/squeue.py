@@ -0,0 +1,86 @@
+# Field order for `squeue --noheader -o`. Name goes last so a job name that
+# contains the separator still parses (split with maxsplit).
+SQUEUE_FIELDS = ("job_id", "partition", "user", "status", "time", "nodes", "nodelist", "name")
+SQUEUE_FORMAT = "--noheader -o '%i|%P|%u|%T|%M|%D|%N|%j'"
+
+
+class SqueueJob:
+    """One squeue row. ``__slots__`` keeps polls with tens of thousands of rows cheap."""
+
+    __slots__ = SQUEUE_FIELDS
+
+    def __init__(self, job_id, partition, user, status, time, nodes, nodelist, name):
+        self.job_id = job_id
+        self.partition = partition
+        self.user = user
+        self.status = status
+        self.time = time
+        self.nodes = nodes
+        self.nodelist = nodelist
+        self.name = name
+
+    def as_tuple(self):
+        return (
+            self.job_id, self.partition, self.user, self.status,
+            self.time, self.nodes, self.nodelist, self.name,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, SqueueJob) and self.as_tuple() == other.as_tuple()
+
+    def same_except_time(self, other):
+        return (
+            self.status == other.status
+            and self.nodelist == other.nodelist
+            and self.nodes == other.nodes
+            and self.partition == other.partition
+            and self.name == other.name
+            and self.user == other.user
+        )
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "partition": self.partition,
+            "name": self.name,
+            "user": self.user,
+            "status": self.status,
+            "time": self.time,
+            "nodes": self.nodes,
+            "nodelist": self.nodelist,
+        }
+
+
+def parse_squeue_output(output):
+    """Parse ``squeue {SQUEUE_FORMAT}`` output into SqueueJob records in a single pass"""
+    jobs = []
+    for line in output.splitlines():
+        fields = line.split("|", 7)
+        if len(fields) == 8:
+            jobs.append(SqueueJob(*fields))
+    return jobs
+
+
+def diff_jobs(previous, current):
+    """Compute per-job changes between two lists of SqueueJob records, keyed by job_id.
+
+    ``ticked`` holds jobs whose only change is TimeUsed, so clients can update
+    that cell without treating the job as changed.
+    """
+    previous_by_id = {job.job_id: job for job in previous}
+    current_by_id = {job.job_id: job for job in current}
+
+    added = [job.to_dict() for job_id, job in current_by_id.items() if job_id not in previous_by_id]
+    removed = [job_id for job_id in previous_by_id if job_id not in current_by_id]
+    changed = []
+    ticked = {}
+    for job_id, job in current_by_id.items():
+        old = previous_by_id.get(job_id)
+        if old is None or old == job:
+            continue
+        if old.same_except_time(job):
+            ticked[job_id] = job.time
+        else:
+            changed.append(job.to_dict())
+
+    return {"added": added, "removed": removed, "changed": changed, "ticked": ticked}
@@ -0,0 +1,277 @@
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+
+import pexpect
+
+from config import (
+    HPC_HOST,
+    SSH_COMMAND,
+    SSH_CONTROL_DIR,
+    SSH_POOL_HEALTH_INTERVAL,
+    SSH_POOL_IDLE_TIMEOUT,
+)
+from metrics import FAILURES, SSH_CONNECT_SECONDS, SSH_PASSWORD_PROMPT_SECONDS
+
+LOGIN_PROMPT = r"\[.*@.* ~\]\$"
+# POSIX-style login names; anything else could smuggle options into the ssh command
+USERNAME_PATTERN = re.compile(r"^[a-z_][a-z0-9._-]{0,31}$")
+# The sentinel is typed split in two so the echoed PS1 assignment never matches it.
+PROMPT_SENTINEL = "__HPC_READY__$ "
+SENTINEL_SETUP = (
+    "stty -echo; bind 'set enable-bracketed-paste off' 2>/dev/null; "
+    "unset PROMPT_COMMAND; PS2=''; PS1='__HPC_''READY__$ '"
+)
+
+
+def is_valid_username(username):
+    return bool(username) and USERNAME_PATTERN.match(username) is not None
+
+
+class SSHConnection:
+    """A long-lived login-node shell for one user.
+
+    The shell runs as an OpenSSH ControlMaster, so extra channels (interactive
+    sessions, port forwards) can be opened over it with ``spawn`` without a new
+    handshake or password prompt.
+    """
+
+    def __init__(self, username, password, host=HPC_HOST):
+        self.username = username
+        self.password = password
+        self.host = host
+        # Unique per connection so a re-login never steals a live master's socket
+        self.control_path = os.path.join(
+            SSH_CONTROL_DIR, f"{username}@{host}-{uuid.uuid4().hex[:8]}"
+        )
+        self.shell = None
+        self.channels = []
+        # Port forwards added with ``-O forward``; they live on the master, not a channel
+        self.forwards = set()
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+
+    def connect(self):
+        """Log in once and switch the shell to a sentinel prompt."""
+        os.makedirs(SSH_CONTROL_DIR, mode=0o700, exist_ok=True)
+        # A new master starts without forwards; the tunnel watcher adds them back
+        self.forwards.clear()
+
+        print(f"🔗 Opening pooled SSH connection for {self.username}...")
+        start = time.perf_counter()
+        self.shell = pexpect.spawn(
+            SSH_COMMAND, args=["-M", "-S", self.control_path, f"{self.username}@{self.host}"],
+            timeout=30,
+        )
+        try:
+            index = self.shell.expect(["Password:", pexpect.EOF, pexpect.TIMEOUT])
+            if index == 1:
+                raise Exception("Unexpected EOF received during SSH")
+            elif index == 2:
+                raise Exception("SSH connection timed out")
+            SSH_PASSWORD_PROMPT_SECONDS.observe(time.perf_counter() - start)
+
+            self.shell.sendline(self.password)
+            # A rejected password re-prompts; fail now rather than after the timeout
+            index = self.shell.expect([LOGIN_PROMPT, "Password:", "Permission denied"], timeout=30)
+            if index != 0:
+                raise Exception("Authentication failed")
+            self.shell.sendline(SENTINEL_SETUP)
+            self.shell.expect_exact(PROMPT_SENTINEL, timeout=30)
+        except Exception:
+            FAILURES.inc(stage="ssh_connect")
+            self._close_shell()
+            raise
+        SSH_CONNECT_SECONDS.observe(time.perf_counter() - start)
+        self.last_used = time.time()
+        print(f"✔ Pooled SSH connection ready for {self.username}.")
+
+    def ensure_connected(self):
+        with self.lock:
+            if self.shell is None or not self.shell.isalive():
+                self.connect()
+
+    def run(self, command, timeout=30):
+        """Run a command in the warm shell and return its output."""
+        with self.lock:
+            if self.shell is None or not self.shell.isalive():
+                raise pexpect.EOF("Pooled SSH connection is closed")
+            try:
+                self.shell.sendline(command)
+                self.shell.expect_exact(PROMPT_SENTINEL, timeout=timeout)
+            except pexpect.TIMEOUT:
+                # The shell is still busy with our command, so it can't be reused
+                self._close_shell()
+                raise
+            self.last_used = time.time()
+            return self.shell.before.decode(errors="replace").replace("\r", "")
+
+    def spawn(self, options="", command="", timeout=30):
+        """Open an extra channel over the master connection (no password prompt)."""
+        args = ["-S", self.control_path, *shlex.split(options), f"{self.username}@{self.host}"]
+        if command:
+            args.append(command)
+        child = pexpect.spawn(SSH_COMMAND, args=args, timeout=timeout)
+        with self.lock:
+            self.channels = [c for c in self.channels if c.isalive()]
+            self.channels.append(child)
+            self.last_used = time.time()
+        return child
+
+    def control(self, operation, options=""):
+        """Send a control command (check, forward, cancel, exit) to the master process"""
+        result = subprocess.run(
+            [SSH_COMMAND, "-S", self.control_path, "-O", operation, *shlex.split(options),
+             f"{self.username}@{self.host}"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        if result.returncode != 0:
+            print(f"⚠️ ssh -O {operation} failed for {self.username}: {result.stderr.strip()}")
+            return False
+        with self.lock:
+            if operation == "forward":
+                self.forwards.add(options)
+            elif operation == "cancel":
+                self.forwards.discard(options)
+        return True
+
+    def active_channels(self):
+        """Open channels plus forwards; either keeps the master from being reaped"""
+        with self.lock:
+            self.channels = [c for c in self.channels if c.isalive()]
+            forwards = len(self.forwards) if self.shell is not None and self.shell.isalive() else 0
+            return len(self.channels) + forwards
+
+    def is_healthy(self):
+        """Probe the shell; busy connections are assumed healthy."""
+        if not self.lock.acquire(blocking=False):
+            return True
+        try:
+            if self.shell is None or not self.shell.isalive():
+                return False
+            self.shell.sendline("true")
+            self.shell.expect_exact(PROMPT_SENTINEL, timeout=5)
+            return True
+        except (pexpect.EOF, pexpect.TIMEOUT):
+            self._close_shell()
+            return False
+        finally:
+            self.lock.release()
+
+    def _close_shell(self):
+        if self.shell:
+            self.shell.close(force=True)
+            self.shell = None
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels:
+                channel.close(force=True)
+            self.channels = []
+            self.forwards.clear()
+            self._close_shell()
+
+
+class SSHConnectionPool:
+    """Per-user pool of warm login-node connections shared by all HPC operations."""
+
+    def __init__(
+        self,
+        idle_timeout=SSH_POOL_IDLE_TIMEOUT,
+        health_interval=SSH_POOL_HEALTH_INTERVAL,
+    ):
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.connections = {}
+        self.retired = []
+        self.lock = threading.Lock()
+        self.reaper_thread = None
+
+    def get(self, username, password):
+        """Return a connected SSHConnection for the user, reconnecting if it dropped."""
+        if not is_valid_username(username):
+            raise ValueError(f"Invalid username {username!r}")
+        with self.lock:
+            conn = self.connections.get(username)
+            if conn is None or conn.password != password:
+                # Never hand an authenticated connection to a different password
+                conn = SSHConnection(username, password)
+            self._ensure_reaper()
+
+        conn.ensure_connected()
+
+        with self.lock:
+            previous = self.connections.get(username)
+            if previous is not conn:
+                self.connections[username] = conn
+                if previous:
+                    self.retired.append(previous)
+        return conn
+
+    def run(self, username, password, command, timeout=30):
+        """Run a command on the login node, reconnecting once if the connection dropped."""
+        conn = self.get(username, password)
+        try:
+            return conn.run(command, timeout)
+        except pexpect.EOF:
+            print(f"🔄 Pooled SSH connection for {username} dropped, reconnecting...")
+            conn = self.get(username, password)
+            return conn.run(command, timeout)
+
+    def close(self, username):
+        with self.lock:
+            conn = self.connections.pop(username, None)
+        if conn:
+            conn.close()
+
+    def close_all(self):
+        with self.lock:
+            conns = list(self.connections.values()) + self.retired
+            self.connections = {}
+            self.retired = []
+        for conn in conns:
+            conn.close()
+
+    def _ensure_reaper(self):
+        if self.reaper_thread is None or not self.reaper_thread.is_alive():
+            self.reaper_thread = threading.Thread(target=self._reap, daemon=True)
+            self.reaper_thread.start()
+
+    def _reap(self):
+        """Background thread that evicts idle connections and health-checks the rest."""
+        while True:
+            time.sleep(self.health_interval)
+            now = time.time()
+            with self.lock:
+                candidates = list(self.connections.items())
+                retired = self.retired
+                self.retired = []
+
+            for conn in retired:
+                if conn.active_channels():
+                    with self.lock:
+                        self.retired.append(conn)
+                else:
+                    conn.close()
+
+            for username, conn in candidates:
+                if conn.active_channels():
+                    continue
+                if now - conn.last_used > self.idle_timeout:
+                    print(f"🧹 Evicting idle SSH connection for {username}")
+                    with self.lock:
+                        if self.connections.get(username) is conn:
+                            del self.connections[username]
+                    conn.close()
+                elif not conn.is_healthy():
+                    # Dropped connections are re-established lazily on next use
+                    print(f"⚠️ Pooled SSH connection for {username} failed health check")
+
+
+ssh_pool = SSHConnectionPool()
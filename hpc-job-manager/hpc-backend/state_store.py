@@ -0,0 +1,248 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from config import LEADER_LEASE_TTL, STATE_STORE
+
+# Identifies this process in leases, e.g. "login-vm:4312:9f3a"
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+
+
+class MemoryStore:
+    """Process-local store; the default, for a single uvicorn worker"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] < now:
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def scan(self, prefix):
+        now = time.time()
+        with self.lock:
+            return {
+                key: entry[0]
+                for key in [k for k in self.data if k.startswith(prefix)]
+                if (entry := self._live(key, now))
+            }
+
+    def acquire_lease(self, name, owner, ttl):
+        """Take or renew lease ``name``; True if ``owner`` holds it afterwards"""
+        with self.lock:
+            entry = self._live(f"lease:{name}", time.time())
+            if entry is None or entry[0] == owner:
+                self.data[f"lease:{name}"] = (owner, time.time() + ttl)
+                return True
+            return False
+
+    def release_lease(self, name, owner):
+        with self.lock:
+            if self.data.get(f"lease:{name}", (None,))[0] == owner:
+                del self.data[f"lease:{name}"]
+
+    def purge(self):
+        """Drop expired entries that nobody has read since they expired"""
+        now = time.time()
+        with self.lock:
+            for key in list(self.data):
+                self._live(key, now)
+
+
+class SQLiteStore:
+    """Store shared by every worker on one host through a SQLite file (WAL mode)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        # Monitor registrations and tokens carry HPC passwords. SQLite gives the
+        # -wal and -shm files the database file's mode, so it has to be private
+        # before the first connection turns on WAL.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.chmod(path + suffix, 0o600)
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+        )
+
+    def _db(self):
+        # One connection per thread; SQLite handles the cross-process locking
+        if not hasattr(self.local, "db"):
+            self.local.db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self.local.db.execute("PRAGMA journal_mode=WAL")
+        return self.local.db
+
+    def get(self, key):
+        row = self._db().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires >= ?)",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        self._db().execute(
+            "INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None),
+        )
+
+    def delete(self, key):
+        self._db().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def scan(self, prefix):
+        rows = self._db().execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? AND (expires IS NULL OR expires >= ?)",
+            (prefix, prefix + "\uffff", time.time()),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT value, expires FROM kv WHERE key = ?", (f"lease:{name}",)).fetchone()
+            held = row is None or row[1] < now or json.loads(row[0]) == owner
+            if held:
+                db.execute(
+                    "INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                    (f"lease:{name}", json.dumps(owner), now + ttl),
+                )
+            db.execute("COMMIT")
+            return held
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def release_lease(self, name, owner):
+        self._db().execute(
+            "DELETE FROM kv WHERE key = ? AND value = ?", (f"lease:{name}", json.dumps(owner))
+        )
+
+    def purge(self):
+        self._db().execute("DELETE FROM kv WHERE expires < ?", (time.time(),))
+
+
+class RedisStore:
+    """Store shared by workers on several hosts; needs the optional ``redis`` package"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("HPC_STATE_STORE=redis://... needs `pip install redis`")
+        self.redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.redis.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key):
+        self.redis.delete(key)
+
+    def scan(self, prefix):
+        keys = list(self.redis.scan_iter(match=f"{prefix}*"))
+        if not keys:
+            return {}
+        return {
+            key.decode(): json.loads(value)
+            for key, value in zip(keys, self.redis.mget(keys))
+            if value is not None
+        }
+
+    def acquire_lease(self, name, owner, ttl):
+        key = f"lease:{name}"
+        if self.redis.set(key, json.dumps(owner), nx=True, px=int(ttl * 1000)):
+            return True
+        # Renewal; a lost race between get and pexpire only shortens a lease we already held
+        if self.get(key) == owner:
+            self.redis.pexpire(key, int(ttl * 1000))
+            return True
+        return False
+
+    def release_lease(self, name, owner):
+        if self.get(f"lease:{name}") == owner:
+            self.redis.delete(f"lease:{name}")
+
+    def purge(self):
+        # Redis expires keys itself
+        pass
+
+
+def create_store(url=STATE_STORE):
+    """"memory" (default), "sqlite:///path/to/state.db" or "redis://host:6379/0" """
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported HPC_STATE_STORE: {url}")
+
+
+class LeaderElector:
+    """Holds a renewable lease so exactly one worker runs the background pollers"""
+
+    def __init__(self, store, name="pollers", ttl=LEADER_LEASE_TTL):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.is_leader = False
+        self.elect_thread = None
+
+    def start(self):
+        if self.elect_thread is None or not self.elect_thread.is_alive():
+            # First round inline so pollers started right after see the outcome
+            self._campaign()
+            self.elect_thread = threading.Thread(target=self._elect, daemon=True)
+            self.elect_thread.start()
+
+    def step_down(self):
+        """Hand the lease over on shutdown instead of letting it time out"""
+        self.is_leader = False
+        self.store.release_lease(self.name, NODE_ID)
+
+    def _campaign(self):
+        try:
+            leader = self.store.acquire_lease(self.name, NODE_ID, self.ttl)
+            if leader:
+                self.store.purge()
+        except Exception as e:
+            print(f"Leader election error: {e}")
+            leader = False
+        if leader != self.is_leader:
+            print(f"👑 {NODE_ID} {'is now' if leader else 'is no longer'} the {self.name} leader")
+        self.is_leader = leader
+
+    def _elect(self):
+        while True:
+            time.sleep(self.ttl / 3)
+            self._campaign()
+
+
+state_store = create_store()
+leader = LeaderElector(state_store)
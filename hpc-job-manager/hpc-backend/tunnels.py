@@ -0,0 +1,122 @@
+import socket
+import threading
+import time
+
+from config import TUNNEL_CHECK_INTERVAL
+from ssh_pool import ssh_pool
+
+
+class Tunnel:
+    """A local port forwarded to a compute node through the login node"""
+
+    def __init__(self, username, password, local_port, node, remote_port):
+        self.username = username
+        self.password = password
+        self.local_port = local_port
+        self.node = node
+        self.remote_port = remote_port
+        self.healthy = False
+        self.created_at = time.time()
+        self.last_checked = None
+        self.reconnects = 0
+
+    @property
+    def forward_spec(self):
+        return f"-L {self.local_port}:{self.node}:{self.remote_port}"
+
+    def to_dict(self):
+        return {
+            "username": self.username,
+            "local_port": self.local_port,
+            "node": self.node,
+            "remote_port": self.remote_port,
+            "healthy": self.healthy,
+            "created_at": self.created_at,
+            "last_checked": self.last_checked,
+            "reconnects": self.reconnects,
+        }
+
+
+class TunnelManager:
+    """Forwards Jupyter ports over each user's pooled ControlMaster connection.
+
+    Every session's forward rides on the user's one authenticated login-node
+    connection (``ssh -O forward``), and a single thread watches all of them,
+    re-establishing any whose local listener has gone away.
+    """
+
+    def __init__(self, check_interval=TUNNEL_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.tunnels = {}
+        self.lock = threading.Lock()
+        self.monitor_thread = None
+
+    def open(self, username, password, local_port, node, remote_port):
+        """Forward local_port to node:remote_port; returns the Tunnel or None on failure"""
+        tunnel = Tunnel(username, password, local_port, node, remote_port)
+        if not self._forward(tunnel):
+            return None
+        with self.lock:
+            self.tunnels[local_port] = tunnel
+            if self.monitor_thread is None or not self.monitor_thread.is_alive():
+                self.monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+                self.monitor_thread.start()
+        return tunnel
+
+    def close(self, local_port):
+        with self.lock:
+            tunnel = self.tunnels.pop(local_port, None)
+        if tunnel is None:
+            return
+        # Cancel on whichever master holds it, which may be a retired one
+        with ssh_pool.lock:
+            conns = list(ssh_pool.connections.values()) + list(ssh_pool.retired)
+        for conn in conns:
+            if tunnel.forward_spec in conn.forwards and conn.shell is not None:
+                conn.control("cancel", tunnel.forward_spec)
+
+    def list(self, username=None):
+        with self.lock:
+            return [
+                tunnel.to_dict()
+                for tunnel in self.tunnels.values()
+                if username is None or tunnel.username == username
+            ]
+
+    def _forward(self, tunnel):
+        try:
+            conn = ssh_pool.get(tunnel.username, tunnel.password)
+            tunnel.healthy = conn.control("forward", tunnel.forward_spec)
+        except Exception as e:
+            print(f"❌ SSH Tunnel Error: {e}")
+            tunnel.healthy = False
+        tunnel.last_checked = time.time()
+        return tunnel.healthy
+
+    @staticmethod
+    def is_listening(port):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def _monitor(self):
+        """Background thread that re-establishes dead forwards"""
+        while True:
+            time.sleep(self.check_interval)
+            with self.lock:
+                tunnels = list(self.tunnels.values())
+            if not tunnels:
+                continue
+            for tunnel in tunnels:
+                if self.is_listening(tunnel.local_port):
+                    tunnel.healthy = True
+                    tunnel.last_checked = time.time()
+                    continue
+                print(f"🔄 Tunnel on port {tunnel.local_port} to {tunnel.node} is down, re-establishing...")
+                tunnel.reconnects += 1
+                self._forward(tunnel)
+
+
+tunnel_manager = TunnelManager()
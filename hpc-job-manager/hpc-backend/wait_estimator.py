@@ -0,0 +1,116 @@
+import threading
+import time
+
+from cluster_state import cluster_state
+from config import ESTIMATE_HISTORY_DAYS, ESTIMATE_TTL, SERVICE_PASSWORD, SERVICE_USER
+from history import job_history, parse_slurm_time
+from services import CPUS_PER_TASK, partition_for, session_profile
+from ssh_pool import ssh_pool
+
+# Past jobs of a shape needed before history is trusted alongside the scheduler
+MIN_HISTORY_JOBS = 5
+
+
+def parse_pending_output(output):
+    """Rows of `squeue --start -h -t PENDING -o '%P|%S|%V'` -> {partition: [(start, submit)]}"""
+    pending = {}
+    for line in output.splitlines():
+        fields = line.strip().split("|")
+        if len(fields) != 3:
+            continue
+        # A job submitted to several partitions is queued in each of them
+        for partition in fields[0].split(","):
+            pending.setdefault(partition, []).append(
+                (parse_slurm_time(fields[1]), parse_slurm_time(fields[2]))
+            )
+    return pending
+
+
+class WaitEstimator:
+    """Predicts time-to-allocation for a resource shape.
+
+    Three signals are combined: idle CPUs in the partition (the shared
+    cluster-state cache), the scheduler's own start estimate for the back of
+    the queue (``squeue --start``), and how long jobs of the same shape waited
+    recently (job history). The queue snapshot is shared across callers for
+    ESTIMATE_TTL seconds so the launch form can ask as often as it likes.
+    """
+
+    def __init__(self, ttl=ESTIMATE_TTL):
+        self.ttl = ttl
+        self.pending = {}
+        self.refreshed_at = 0
+        self.lock = threading.Lock()
+
+    def _snapshot(self, username, password):
+        """Current partition and queue state, refreshed at most once per TTL"""
+        if SERVICE_USER:
+            username, password = SERVICE_USER, SERVICE_PASSWORD
+        cluster_state.ensure_fresh(username, password)
+        with self.lock:
+            if time.time() - self.refreshed_at > self.ttl:
+                self.pending = parse_pending_output(
+                    ssh_pool.run(username, password, "squeue --start -h -t PENDING -o '%P|%S|%V'")
+                )
+                self.refreshed_at = time.time()
+            return cluster_state.get_partitions()["partitions"], self.pending
+
+    def estimate(self, username, password, use_gpu, num_nodes, num_tasks):
+        """Expected wait in seconds for a launch of this shape, with the evidence used"""
+        partitions, pending = self._snapshot(username, password)
+        partition = partition_for(use_gpu) or next(
+            (name for name, info in partitions.items() if info["default"]), None
+        )
+        info = partitions.get(partition)
+        if info is None:
+            raise ValueError(f"Unknown partition {partition or '(default)'}")
+
+        now = time.time()
+        queue = pending.get(partition, [])
+        cpus_needed = num_tasks * CPUS_PER_TASK
+        history = job_history.shape_wait_times(
+            partition, num_nodes, use_gpu, int(now) - ESTIMATE_HISTORY_DAYS * 86400
+        )
+
+        scheduler = None
+        if info["cpus_idle"] >= cpus_needed:
+            # Whatever is still pending doesn't fit, so a launch this small backfills
+            scheduler = 0
+        else:
+            # The newest pending job is roughly where a new launch would queue
+            starts = [(submit or 0, start) for start, submit in queue if start]
+            if starts:
+                scheduler = max(max(starts)[1] - now, 0)
+
+        if not info["up"]:
+            estimate, confidence = None, "partition down"
+        elif scheduler == 0:
+            # Free capacity right now beats whatever happened last week
+            estimate, confidence = 0, "high"
+        elif scheduler is not None and history["jobs"] >= MIN_HISTORY_JOBS:
+            estimate, confidence = (scheduler + history["p50"]) / 2, "high"
+        elif scheduler is not None:
+            estimate, confidence = scheduler, "medium"
+        elif history["jobs"]:
+            estimate, confidence = history["p50"], "low"
+        else:
+            estimate, confidence = None, "unknown"
+
+        return {
+            "profile": session_profile(use_gpu, num_nodes, num_tasks),
+            "partition": partition,
+            "estimate_seconds": round(estimate) if estimate is not None else None,
+            "p90_seconds": history["p90"],
+            "confidence": confidence,
+            "sources": {
+                "scheduler_seconds": round(scheduler) if scheduler is not None else None,
+                "history": history,
+                "pending_jobs": len(queue),
+                "cpus_idle": info["cpus_idle"],
+                "cpus_needed": cpus_needed,
+                "snapshot_age": round(now - self.refreshed_at, 1),
+            },
+        }
+
+
+wait_estimator = WaitEstimator()
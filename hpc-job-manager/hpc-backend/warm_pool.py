@@ -0,0 +1,388 @@
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from config import (
+    AUTH_TOKEN_TTL,
+    WARM_POOL,
+    WARM_POOL_CHECK_INTERVAL,
+    WARM_POOL_FILL_WORKERS,
+    WARM_POOL_MAX_IDLE,
+    WARM_POOL_MAX_SESSIONS,
+    WARM_POOL_RELEASE,
+    WARM_POOL_TIME,
+)
+from ports import port_registry
+from services import HPCSessionManager, parse_profile
+from sessions import JupyterSession, session_registry
+from state_store import NODE_ID, leader, state_store
+from tunnels import tunnel_manager
+
+# Failed fills back off exponentially up to this many seconds
+MAX_FILL_BACKOFF = 600
+# Published sessions vanish this long after their holder stops refreshing them
+ENTRY_TTL = WARM_POOL_CHECK_INTERVAL * 4
+# Longest a claim or a holder's check keeps a session locked
+CLAIM_TTL = 60
+
+
+class WarmPool:
+    """Keeps Jupyter sessions allocated ahead of demand for each logged-in user.
+
+    Sessions run under the user's own account, launched over their pooled
+    connection, so a warm notebook has exactly the rights and billing of one
+    the user started. The leader fills the pool for users who have logged in;
+    the srun shell holding each allocation stays on the worker that launched
+    it, and the session (node, port, token) is published to the state store.
+    Whichever worker serves the next matching /start_job claims it there and,
+    if it isn't the holder, tunnels to it over its own connection. The holder
+    then keeps only the srun shell, until the job ends.
+
+    Fills go through a queue drained by WARM_POOL_FILL_WORKERS threads, and
+    the pool as a whole stops at WARM_POOL_MAX_SESSIONS, so a class logging in
+    at once doesn't turn into a burst of srun calls and SSH logins.
+    """
+
+    def __init__(self, sizes=WARM_POOL, max_idle=WARM_POOL_MAX_IDLE, release=WARM_POOL_RELEASE,
+                 store=state_store, fill_workers=WARM_POOL_FILL_WORKERS,
+                 max_sessions=WARM_POOL_MAX_SESSIONS):
+        self.sizes = dict(sizes)
+        self.max_idle = max_idle
+        self.release = release
+        self.store = store
+        self.fill_workers = fill_workers
+        self.max_sessions = max_sessions
+        self.fills = queue.Queue()
+        # Ready sessions launched by this worker: warm id -> (store key, manager)
+        self.held = {}
+        # Claimed by another worker; the allocation lives as long as these srun shells
+        self.handed_off = []
+        self.filling = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.retry_at = defaultdict(float)
+        self.stats = {"hits": 0, "misses": 0, "filled": 0, "fill_failures": 0, "expired": 0}
+        self.running = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.maintain_thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.sizes)
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.running = True
+        self.maintain_thread = threading.Thread(target=self._maintain, daemon=True)
+        self.maintain_thread.start()
+        for i in range(self.fill_workers):
+            threading.Thread(target=self._fill_worker, name=f"warm-fill-{i}", daemon=True).start()
+
+    def stop(self):
+        """Stop refilling and release every idle session this worker holds"""
+        self.running = False
+        self.wake.set()
+        with self.lock:
+            held = list(self.held.values())
+            self.held = {}
+        for key, manager in held:
+            self.store.delete(key)
+            self._release(manager)
+
+    def warm(self, username, password):
+        """Keep sessions ready for ``username`` while they are logged in"""
+        if not self.enabled:
+            return
+        self.store.set(
+            f"warm_user:{username}",
+            {"username": username, "password": password, "targets": dict(self.sizes),
+             "expires_at": time.time() + AUTH_TOKEN_TTL},
+            ttl=AUTH_TOKEN_TTL,
+        )
+        self.wake.set()
+
+    def forget(self, username):
+        """Stop warming sessions for ``username``; their holders cancel the idle ones"""
+        self.store.delete(f"warm_user:{username}")
+        for key, entry in self.store.scan(f"warm:{username}:").items():
+            if not entry.get("claimed"):
+                self.store.delete(key)
+        self.wake.set()
+
+    def acquire(self, username, password, profile):
+        """Claim one of the user's ready sessions for ``profile``; the registered session or None"""
+        if profile not in self.sizes:
+            return None
+        entries = sorted(
+            (
+                (key, entry) for key, entry in self.store.scan(f"warm:{username}:{profile}:").items()
+                if not entry.get("claimed")
+            ),
+            key=lambda item: item[1]["ready_since"],
+        )
+        session = None
+        for key, entry in entries:
+            session = self._claim(key, entry, password)
+            if session is not None:
+                break
+        with self.lock:
+            self.stats["hits" if session else "misses"] += 1
+        # Demand: grow a shrunken pool back to its configured size
+        user = self.store.get(f"warm_user:{username}")
+        if user and user["password"] == password:
+            self._set_target(user, profile, self.sizes[profile])
+        return session
+
+    def claim_job(self, username, slurm_job_id):
+        """Take a warm job out of the pool once a launch has reattached to it another way"""
+        for key, entry in self.store.scan(f"warm:{username}:").items():
+            if entry["slurm_job_id"] != str(slurm_job_id) or entry.get("claimed"):
+                continue
+            if self.store.acquire_lease(f"warm:{entry['id']}", NODE_ID, CLAIM_TTL):
+                try:
+                    self._mark_claimed(key)
+                finally:
+                    self.store.release_lease(f"warm:{entry['id']}", NODE_ID)
+
+    def status(self):
+        ready = defaultdict(int)
+        for entry in self.store.scan("warm:").values():
+            if not entry.get("claimed"):
+                ready[entry["profile"]] += 1
+        filling = defaultdict(int)
+        with self.lock:
+            for (_, profile), count in self.filling.items():
+                filling[profile] += count
+            stats = dict(self.stats)
+        return {
+            "enabled": self.enabled,
+            "release": self.release,
+            "max_idle": self.max_idle,
+            "users": len(self.store.scan("warm_user:")),
+            "max_sessions": self.max_sessions,
+            "fill_workers": self.fill_workers,
+            "profiles": {
+                profile: {"size": size, "ready": ready[profile], "filling": filling[profile]}
+                for profile, size in self.sizes.items()
+            },
+            **stats,
+        }
+
+    def _claim(self, key, entry, password):
+        lease = f"warm:{entry['id']}"
+        if not self.store.acquire_lease(lease, NODE_ID, CLAIM_TTL):
+            return None
+        try:
+            current = self.store.get(key)
+            if current is None or current.get("claimed"):
+                return None
+            with self.lock:
+                held = self.held.get(entry["id"])
+            if held is not None:
+                # Launched here: hand over the manager and its tunnel as they are
+                manager = held[1]
+                if manager.password != password or not manager.is_alive():
+                    return None
+                if not tunnel_manager.is_listening(manager.port):
+                    return None
+                with self.lock:
+                    self.held.pop(entry["id"], None)
+                self.store.delete(key)
+                return session_registry.register(manager)
+
+            # Held by another worker: reach the notebook through this worker's connection
+            local_port = port_registry.lease(owner=entry["username"])
+            tunnel = tunnel_manager.open(
+                entry["username"], password, local_port, entry["node"], entry["remote_port"]
+            )
+            if tunnel is None or not tunnel_manager.is_listening(local_port):
+                if tunnel is not None:
+                    tunnel_manager.close(local_port)
+                port_registry.release(local_port)
+                return None
+            self._mark_claimed(key)
+            session = JupyterSession(
+                entry["username"], password, entry["profile"], entry["slurm_job_id"], entry["node"],
+                entry["remote_port"], entry["token"], local_port, tunnel=tunnel,
+            )
+            session_registry.add(session)
+            return session
+        finally:
+            self.store.release_lease(lease, NODE_ID)
+
+    def _mark_claimed(self, key):
+        """Tell the holder the session is in use; call with the session's lease held"""
+        entry = self.store.get(key)
+        if entry is not None:
+            entry["claimed"] = True
+            self.store.set(key, entry, ttl=ENTRY_TTL)
+
+    def _set_target(self, user, profile, target):
+        if user["targets"].get(profile) == target:
+            return
+        user["targets"][profile] = target
+        remaining = user["expires_at"] - time.time()
+        if remaining > 0:
+            self.store.set(f"warm_user:{user['username']}", user, ttl=remaining)
+
+    @staticmethod
+    def _release(manager):
+        # Closing the srun shell ends the allocation
+        manager.running = False
+        manager.cleanup()
+
+    @staticmethod
+    def _hand_off(manager):
+        """Drop this worker's tunnel but keep the srun shell holding the allocation"""
+        if manager.tunnel:
+            tunnel_manager.close(manager.tunnel.local_port)
+            manager.tunnel = None
+        if manager.port_leased:
+            port_registry.release(manager.port)
+            manager.port_leased = False
+
+    def _check_held(self, now):
+        """Refresh, expire or hand off each session this worker holds"""
+        with self.lock:
+            held = list(self.held.items())
+        for warm_id, (key, manager) in held:
+            lease = f"warm:{warm_id}"
+            # A claim in progress holds the lease; look again next round
+            if not self.store.acquire_lease(lease, NODE_ID, CLAIM_TTL):
+                continue
+            try:
+                entry = self.store.get(key)
+                if entry is not None and not entry.get("claimed") and manager.is_alive():
+                    if now - entry["ready_since"] <= self.max_idle:
+                        self.store.set(key, entry, ttl=ENTRY_TTL)
+                        continue
+                    with self.lock:
+                        self.stats["expired"] += 1
+                    if self.release == "shrink":
+                        user = self.store.get(f"warm_user:{entry['username']}")
+                        if user:
+                            target = user["targets"].get(entry["profile"], 0)
+                            self._set_target(user, entry["profile"], max(target - 1, 0))
+
+                with self.lock:
+                    self.held.pop(warm_id, None)
+                self.store.delete(key)
+                if entry is not None and entry.get("claimed") and manager.is_alive():
+                    self._hand_off(manager)
+                    with self.lock:
+                        self.handed_off.append(manager)
+                else:
+                    # Idle too long, dead, or withdrawn by forget()
+                    self._release(manager)
+            finally:
+                self.store.release_lease(lease, NODE_ID)
+
+        with self.lock:
+            ended = [manager for manager in self.handed_off if not manager.is_alive()]
+            self.handed_off = [manager for manager in self.handed_off if manager.is_alive()]
+        for manager in ended:
+            self._release(manager)
+
+    def _top_up(self, now):
+        """Queue fills for logged-in users below their target, within the global cap; leader only"""
+        ready = defaultdict(int)
+        for entry in self.store.scan("warm:").values():
+            if not entry.get("claimed"):
+                ready[(entry["username"], entry["profile"])] += 1
+        wanted = []
+        with self.lock:
+            budget = self.max_sessions - sum(ready.values()) - sum(self.filling.values())
+            for user in self.store.scan("warm_user:").values():
+                for profile in self.sizes:
+                    slot = (user["username"], profile)
+                    missing = user["targets"].get(profile, 0) - ready[slot] - self.filling[slot]
+                    if missing > 0 and now >= self.retry_at[slot]:
+                        wanted.append([user, profile, missing])
+            # One session per user and profile per round, so the cap is shared out fairly
+            while budget > 0 and wanted:
+                for item in list(wanted):
+                    if budget <= 0:
+                        break
+                    user, profile, missing = item
+                    self.filling[(user["username"], profile)] += 1
+                    self.fills.put((user["username"], user["password"], profile))
+                    budget -= 1
+                    item[2] -= 1
+                    if item[2] == 0:
+                        wanted.remove(item)
+
+    def _fill_worker(self):
+        while True:
+            username, password, profile = self.fills.get()
+            try:
+                self._fill(username, password, profile)
+            except Exception as e:
+                print(f"❌ Warm pool fill of {profile} for {username} failed: {e}")
+
+    def _maintain(self):
+        """Background thread that expires idle sessions and tops each user's pool up"""
+        while self.running:
+            now = time.time()
+            try:
+                self._check_held(now)
+                # Only the leader allocates, so N workers don't keep N pools
+                if leader.is_leader:
+                    self._top_up(now)
+            except Exception as e:
+                print(f"Warm pool maintenance error: {e}")
+            self.wake.wait(WARM_POOL_CHECK_INTERVAL)
+            self.wake.clear()
+
+    def _fill(self, username, password, profile):
+        """Allocate one session for ``username`` and publish it as ready"""
+        slot = (username, profile)
+        use_gpu, num_nodes, num_tasks = parse_profile(profile)
+        manager = HPCSessionManager(
+            username, password, use_gpu, WARM_POOL_TIME, num_nodes, num_tasks
+        )
+        try:
+            success, _ = manager.start()
+        except Exception as e:
+            print(f"❌ Warm pool fill of {profile} for {username} failed: {e}")
+            success = False
+
+        with self.lock:
+            self.filling[slot] -= 1
+            if not success:
+                self.failures[slot] += 1
+                self.stats["fill_failures"] += 1
+                self.retry_at[slot] = time.time() + min(
+                    WARM_POOL_CHECK_INTERVAL * 2 ** self.failures[slot], MAX_FILL_BACKOFF
+                )
+                return
+            if not self.running:
+                success = False
+            else:
+                self.failures[slot] = 0
+                self.stats["filled"] += 1
+        if not success:
+            self._release(manager)
+            return
+
+        warm_id = uuid.uuid4().hex[:12]
+        key = f"warm:{username}:{profile}:{warm_id}"
+        with self.lock:
+            self.held[warm_id] = (key, manager)
+        self.store.set(key, {
+            "id": warm_id,
+            "username": username,
+            "profile": profile,
+            "slurm_job_id": manager.slurm_job_id,
+            "node": manager.node_name,
+            "remote_port": manager.remote_port,
+            "token": manager.token,
+            "holder": NODE_ID,
+            "ready_since": time.time(),
+        }, ttl=ENTRY_TTL)
+        print(f"🔥 Warm {profile} session ready for {username} on {manager.node_name}")
+
+
+warm_pool = WarmPool()
@@ -1,10 +1,60 @@
 import axios from "axios";
 
 const API_URL = "http://localhost:8000";  // Adjust based on your backend
+const TOKEN_KEY = "hpcToken";
+const TOKEN_USER_KEY = "hpcTokenUser";
+
+// After /login the backend holds the HPC session; later calls send the token, not the password
+export const getToken = () => localStorage.getItem(TOKEN_KEY);
+
+// A token only speaks for the user who logged in with it; anyone else has to log in again
+export const hasTokenFor = (username: string) =>
+  !!getToken() && localStorage.getItem(TOKEN_USER_KEY) === username;
+
+export const clearToken = () => {
+  localStorage.removeItem(TOKEN_KEY);
+  localStorage.removeItem(TOKEN_USER_KEY);
+};
+
+export const authHeaders = (): Record<string, string> => {
+  const token = getToken();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+axios.interceptors.request.use((config) => {
+  const token = getToken();
+  if (token) config.headers.Authorization = `Bearer ${token}`;
+  return config;
+});
+
+// An expired or revoked token is useless; drop it so the next action logs in again
+axios.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response?.status === 401) clearToken();
+    return Promise.reject(error);
+  }
+);
+
+export const login = async (username: string, password: string) => {
+  clearToken();
+  const response = await axios.post(`${API_URL}/login`, { username, password });
+  localStorage.setItem(TOKEN_KEY, response.data.token);
+  localStorage.setItem(TOKEN_USER_KEY, response.data.username);
+  return response.data;
+};
+
+export const logout = async () => {
+  try {
+    await axios.post(`${API_URL}/logout`);
+  } finally {
+    clearToken();
+  }
+};
 
 export interface JobRequest {
   username: string;
-  password: string;
+  password?: string;
   use_gpu: boolean;
   cpu_time: string;
   num_nodes: number;
@@ -13,7 +63,19 @@ export interface JobRequest {
 
 export interface JobResponse {
   status: string;
-  jupyter_url: string;
+  launch_id: string | null;
+  jupyter_url: string | null;
+}
+
+export interface LaunchEvent {
+  stage: string;
+  time: number;
+  node?: string;
+  job_id?: string;
+  port?: number;
+  position?: number;
+  jupyter_url?: string;
+  error?: string;
 }
 
 export const startHPCJob = async (jobData: JobRequest) => {
@@ -21,12 +83,96 @@ export const startHPCJob = async (jobData: JobRequest) => {
   return response.data;
 };
 
+export interface WaitEstimate {
+  profile: string;
+  partition: string;
+  estimate_seconds: number | null;
+  p90_seconds: number | null;
+  confidence: string;
+}
+
+export const estimateWait = async (request: Omit<JobRequest, "cpu_time">) => {
+  const response = await axios.post<WaitEstimate>(`${API_URL}/estimate_wait`, request);
+  return response.data;
+};
+
+export const getLaunch = async (launchId: string) => {
+  const response = await axios.get(`${API_URL}/launch/${launchId}`);
+  return response.data;
+};
+
+export const streamLaunchEvents = (launchId: string, onEvent: (event: LaunchEvent) => void) => {
+  const source = new EventSource(`${API_URL}/launch/${launchId}/events`);
+  const stages = ["queued", "queue_position", "started", "reattached", "connected", "queued_in_slurm", "allocated", "jupyter_ready", "tunnel_up", "ready", "failed"];
+  stages.forEach((stage) =>
+    source.addEventListener(stage, (e) => {
+      onEvent(JSON.parse((e as MessageEvent).data));
+      if (stage === "ready" || stage === "failed") source.close();
+    })
+  );
+  return source;
+};
+
 export const fetchRunningJobs = async (username: string) => {
   const response = await axios.get(`${API_URL}/running_jobs/${username}`);
   return response.data;
 };
 
-export const cancelJob = async (jobId: string, username: string, password: string) => {
+export interface JobDelta {
+  version: number;
+  added: Job[];
+  removed: string[];
+  changed: Job[];
+  ticked: Record<string, string>;
+}
+
+export interface JobChanges {
+  version: number;
+  full: boolean;
+  jobs?: Job[];
+  deltas?: JobDelta[];
+}
+
+export interface Job {
+  job_id: string;
+  name: string;
+  status: string;
+  partition: string;
+  user: string;
+  time: string;
+  nodes: string;
+  nodelist: string;
+}
+
+// Apply a snapshot or a list of deltas from /running_jobs to the current job list
+export const applyJobChanges = (jobs: Job[], changes: JobChanges): Job[] => {
+  if (changes.full) return changes.jobs || [];
+
+  const byId = new Map(jobs.map((job) => [job.job_id, job]));
+  for (const delta of changes.deltas || []) {
+    delta.removed.forEach((jobId) => byId.delete(jobId));
+    [...delta.added, ...delta.changed].forEach((job) => byId.set(job.job_id, job));
+    Object.entries(delta.ticked).forEach(([jobId, time]) => {
+      const job = byId.get(jobId);
+      if (job) byId.set(jobId, { ...job, time });
+    });
+  }
+  return Array.from(byId.values());
+};
+
+// The job stream 404s until the backend is monitoring the user; safe to call again
+export const startMonitoring = async (username: string) => {
+  const response = await axios.post(`${API_URL}/start_monitoring`, { username });
+  return response.data;
+};
+
+export const streamJobChanges = (username: string, onChanges: (changes: JobChanges) => void) => {
+  const source = new EventSource(`${API_URL}/running_jobs/${encodeURIComponent(username)}/stream`);
+  source.addEventListener("jobs", (e) => onChanges(JSON.parse((e as MessageEvent).data)));
+  return source;
+};
+
+export const cancelJob = async (jobId: string, username: string, password?: string) => {
   const response = await axios.delete(`${API_URL}/cancel_job/${jobId}`, {
     params: { username, password },
   });
@@ -41,7 +187,7 @@ export const getRunningJobs = async (username: string) => {
   export const deleteJob = async (username: string, jobId: string) => {
     await fetch(`${API_URL}/delete_job`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", ...authHeaders() },
       body: JSON.stringify({ username, job_id: jobId }),
     });
   };
\ No newline at end of file
@@ -1,5 +1,22 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { useUser } from '../contexts/UserContext';
+import { authHeaders, clearToken, estimateWait, getToken, hasTokenFor, LaunchEvent, login, streamLaunchEvents, WaitEstimate } from "../api";
+
+const STAGE_MESSAGES: Record<string, string> = {
+  queued: "⏳ Launch queued...",
+  started: "🔗 Connecting to HPC...",
+  reattached: "♻️ Found your running Jupyter session, reconnecting...",
+  connected: "✔ Connected, requesting a node...",
+  queued_in_slurm: "⏳ Waiting in the Slurm queue...",
+  jupyter_ready: "🚀 Jupyter started, opening tunnel...",
+  tunnel_up: "🔗 Tunnel established...",
+};
+
+const describeWait = (estimate: WaitEstimate) => {
+  if (estimate.estimate_seconds === null) return `No wait estimate for ${estimate.partition} (${estimate.confidence})`;
+  if (estimate.estimate_seconds < 60) return `⚡ ${estimate.partition}: should start right away`;
+  return `⏱️ ${estimate.partition}: expected wait ~${Math.round(estimate.estimate_seconds / 60)} min (${estimate.confidence} confidence)`;
+};
 
 const CreateJob = () => {
   const setUsername = useUser(); 
@@ -11,28 +28,78 @@ const CreateJob = () => {
   const [status, setStatus] = useState("");
   const [jupyterURL, setJupyterURL] = useState("");
   const [localUsername, setLocalUsername] = useState(""); // Local state
+  const [waitHint, setWaitHint] = useState("");
+
+  // Re-estimate the queue wait whenever the resource shape changes (debounced)
+  useEffect(() => {
+    // A token stored for another username would only get 403s; wait for the next login
+    if (!localUsername || (getToken() ? !hasTokenFor(localUsername) : !password)) return;
+    const timer = setTimeout(() => {
+      estimateWait({ username: localUsername, password, use_gpu, num_nodes, num_tasks })
+        .then((estimate) => setWaitHint(describeWait(estimate)))
+        .catch(() => setWaitHint(""));
+    }, 800);
+    return () => clearTimeout(timer);
+  }, [localUsername, password, use_gpu, num_nodes, num_tasks]);
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setLocalUsername(localUsername); // Store username in context
     setStatus("🔗 Connecting to HPC...");
 
-    const requestData = { username: localUsername, password, use_gpu, num_nodes, num_tasks, cpu_time };
+    try {
+      // Log in once per user; later launches, estimates and cancels reuse the token
+      if (!hasTokenFor(localUsername)) await login(localUsername, password);
+    } catch (error) {
+      setStatus("❌ HPC login failed.");
+      return;
+    }
+
+    const requestData = { username: localUsername, use_gpu, num_nodes, num_tasks, cpu_time };
 
     try {
       const response = await fetch("http://127.0.0.1:8000/start_job", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...authHeaders() },
         body: JSON.stringify(requestData),
       });
 
       const data = await response.json();
-      if (response.ok) {
-        setJupyterURL(data.jupyter_url);
-        setStatus("✅ Jupyter Notebook launched!");
-      } else {
+      if (response.status === 401) {
+        clearToken();
+        setStatus("🔒 HPC session expired, please launch again.");
+        return;
+      }
+      if (response.status === 429 || response.status === 409) {
+        setStatus(`⏳ ${data.detail}`);
+        return;
+      }
+      if (!response.ok) {
         setStatus("❌ HPC Job Failed.");
+        return;
+      }
+
+      if (data.jupyter_url) {
+        // Your existing session or a pre-warmed one: no new allocation needed
+        setJupyterURL(data.jupyter_url);
+        setStatus(`✅ Jupyter Notebook launched! (${data.status})`);
+        return;
       }
+
+      streamLaunchEvents(data.launch_id, (event: LaunchEvent) => {
+        if (event.stage === "ready") {
+          setJupyterURL(event.jupyter_url || "");
+          setStatus("✅ Jupyter Notebook launched!");
+        } else if (event.stage === "failed") {
+          setStatus("❌ HPC Job Failed.");
+        } else if (event.stage === "queue_position") {
+          setStatus(`⏳ Launch queued (position ${event.position})...`);
+        } else if (event.stage === "allocated") {
+          setStatus(`🖥️ Allocated node ${event.node}, starting Jupyter...`);
+        } else if (STAGE_MESSAGES[event.stage]) {
+          setStatus(STAGE_MESSAGES[event.stage]);
+        }
+      });
     } catch (error) {
       setStatus("❌ Network error.");
     }
@@ -53,6 +120,7 @@ const CreateJob = () => {
         <input className="w-full p-2 border rounded" type="text" value={cpu_time} onChange={(e) => setCpuTime(e.target.value)} placeholder="CPU Time (hh:mm:ss)" />
         <button className="w-full bg-blue-600 text-white py-2 rounded hover:bg-blue-700">Launch</button>
       </form>
+      {waitHint && <p className="mt-2 text-sm text-gray-600">{waitHint}</p>}
       <p className="mt-4">{status}</p>
       {jupyterURL && <a className="block text-blue-600 underline mt-2" href={jupyterURL} target="_blank">Open Jupyter Notebook</a>}
     </div>
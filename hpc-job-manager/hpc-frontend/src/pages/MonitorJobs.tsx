@@ -1,17 +1,6 @@
 import { useEffect, useState } from "react";
 import { useUser } from '../contexts/UserContext';
-
-// Ensure Job interface matches backend response
-interface Job {
-  job_id: string;
-  name: string;
-  status: string;
-  partition: string;
-  user: string;
-  time: string;
-  nodes: string;
-  nodelist: string;
-}
+import { Job, applyJobChanges, startMonitoring, streamJobChanges } from "../api";
 
 const MonitorJobs = () => {
   const { user } = useUser();  // Get the full user object from context
@@ -20,44 +9,43 @@ const MonitorJobs = () => {
   const [loading, setLoading] = useState<boolean>(false); // Track loading state
   const [error, setError] = useState<string | null>(null); // Track errors
 
-  const fetchJobs = async () => {
+  useEffect(() => {
     if (!username) {
       setError("Username is required to fetch jobs.");
       return;
     }
-  
+
     setLoading(true);
     setError(null); // Clear any previous errors
-  
-    try {
-      const response = await fetch(`/api/jobs?username=${encodeURIComponent(username)}`);
 
+    let source: EventSource | null = null;
+    let cancelled = false;
 
-  
-      // Check if the response is HTML (usually occurs on error pages)
-      const contentType = response.headers.get("content-type");
-      if (contentType && contentType.includes("text/html")) {
-        const html = await response.text();
-        setError(`Unexpected HTML response: ${html}`);
-        return;
-      }
-  
-      if (!response.ok) {
-        throw new Error("Failed to fetch jobs");
-      }
-  
-      const data = await response.json();
-      setJobs(data);
-    } catch (err) {
-      setError(err instanceof Error ? err.message : "Unknown error occurred");
-    } finally {
-      setLoading(false);
-    }
-  };
+    startMonitoring(username)
+      .then(() => {
+        if (cancelled) return;
+        // The first event is a full snapshot; later ones only carry what changed
+        source = streamJobChanges(username, (changes) => {
+          setJobs((current) => applyJobChanges(current, changes));
+          setError(null); // Events are arriving again after a reconnect
+          setLoading(false);
+        });
+        source.onerror = () => {
+          setError("Lost connection to job monitor");
+          setLoading(false);
+        };
+      })
+      .catch(() => {
+        if (cancelled) return;
+        setError("Could not start job monitoring; please log in again");
+        setLoading(false);
+      });
 
-  useEffect(() => {
-    fetchJobs();
-  }, [username]); // Refetch jobs when username changes
+    return () => {
+      cancelled = true;
+      source?.close();
+    };
+  }, [username]); // Resubscribe when username changes
 
   if (loading) {
     return <div>Loading jobs...</div>;
@@ -0,0 +1,197 @@
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Same variable the ollama CLI reads; point it at a stub server to run the
+# agents without a model
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+# How long the server keeps a model loaded after each request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+DEFAULT_PORT = 11434
+
+class OllamaError(Exception):
+    """The Ollama server answered with an error (unknown model, bad request, ...)"""
+
+def parse_host(host):
+    """"127.0.0.1:11434", "http://gpu-box" or "https://x:443" -> (scheme, hostname, port)"""
+    if "://" not in host:
+        host = f"http://{host}"
+    parts = urlsplit(host)
+    hostname = parts.hostname or "127.0.0.1"
+    # 0.0.0.0 is where the server listens, not an address to connect to
+    if hostname == "0.0.0.0":
+        hostname = "127.0.0.1"
+    return parts.scheme, hostname, parts.port or DEFAULT_PORT
+
+def first_content_line(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("```") and not line.endswith(":"):
+            return line
+    return None
+
+class ProgressLine:
+    """One-line "Generating... 42 chars, 0.8s" status, redrawn in place"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.monotonic()
+
+    def update(self, text):
+        elapsed = time.monotonic() - self.started_at
+        sys.stdout.write(f"\r{self.label}... {len(text)} chars, {elapsed:.1f}s")
+        sys.stdout.flush()
+
+    def clear(self):
+        sys.stdout.write("\r\033[K")
+        sys.stdout.flush()
+
+class OllamaClient:
+    """Talks to the Ollama HTTP API over one kept-alive connection.
+
+    Replaces spawning `ollama run` per prompt: no CLI startup, no spinner
+    output mixed into the answer, and the model stays loaded between turns.
+    One request at a time per client.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE):
+        self.scheme, self.hostname, self.port = parse_host(host)
+        self.keep_alive = keep_alive
+        self.connection = None
+
+    def _connect(self, timeout):
+        if self.connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            )
+            self.connection = connection_class(self.hostname, self.port, timeout=timeout)
+        else:
+            self.connection.timeout = timeout
+            if self.connection.sock is not None:
+                self.connection.sock.settimeout(timeout)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _post(self, path, payload, timeout):
+        """Send a request, reconnecting once if the kept-alive connection went stale"""
+        body = json.dumps(payload)
+        headers = {"Content-Type": "application/json"}
+        for attempt in (1, 2):
+            reused = self.connection is not None
+            connection = self._connect(timeout)
+            try:
+                connection.request("POST", path, body, headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if not reused or attempt == 2:
+                    raise
+                continue
+            except Exception:
+                self.close()
+                raise
+            if response.status != 200:
+                detail = response.read().decode(errors="replace")
+                try:
+                    detail = json.loads(detail).get("error", detail)
+                except ValueError:
+                    pass
+                raise OllamaError(f"{path} returned {response.status}: {detail}")
+            return response
+
+    def stream(self, model, prompt, timeout=10):
+        """Yield the response text piece by piece as the model produces it.
+
+        ``timeout`` bounds the whole generation. Closing the generator early
+        drops the connection, which makes the server stop generating.
+        """
+        deadline = time.monotonic() + timeout
+        response = self._post(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive},
+            timeout,
+        )
+        finished = False
+        try:
+            # One JSON object per line, the last one with "done": true
+            for line in response:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{model} did not finish within {timeout}s")
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    finished = True
+                    break
+        finally:
+            if finished:
+                # Drain the chunked terminator so the connection can be reused
+                response.read()
+            else:
+                self.close()
+
+    def generate(self, model, prompt, timeout=10, on_text=None):
+        """The full response text; ``on_text`` sees the text so far after each piece"""
+        text = ""
+        for piece in self.stream(model, prompt, timeout):
+            text += piece
+            if on_text:
+                on_text(text)
+        return text
+
+    def first_line(self, model, prompt, timeout=10, on_text=None):
+        """The first line of the answer that isn't a ``` fence or an intro ("Try this:").
+
+        Returns as soon as that line is complete and cancels the rest of the
+        generation, so a chatty model costs no more than its first command.
+        """
+        text = ""
+        stream = self.stream(model, prompt, timeout)
+        try:
+            for piece in stream:
+                text += piece
+                if on_text:
+                    on_text(text)
+                if "\n" in piece:
+                    # Everything before the last newline is complete
+                    line = first_content_line(text.split("\n")[:-1])
+                    if line is not None:
+                        return line
+            return first_content_line(text.split("\n")) or ""
+        finally:
+            stream.close()
+
+    def preload(self, model, timeout=60):
+        """Load ``model`` into memory ahead of the first prompt"""
+        response = self._post(
+            "/api/generate", {"model": model, "keep_alive": self.keep_alive}, timeout
+        )
+        response.read()
+
+def preload_in_background(*models):
+    """Warm models on their own connection while the agent starts up"""
+    def load():
+        client = OllamaClient()
+        try:
+            for model in models:
+                client.preload(model)
+        except Exception as e:
+            logging.warning(f"Could not preload {', '.join(models)}: {e}")
+        finally:
+            client.close()
+    threading.Thread(target=load, daemon=True).start()
+
+ollama = OllamaClient()
@@ -1,15 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pexpect
+import re
 import sys
 import random
 import time
-import re
 import threading
 import webbrowser
 import subprocess
 from tkinter import ttk
 
+LOGIN_HOSTNAME = "coe-hpc1"
+NODE_PROMPT = r"\[[^@\]\s]+@([\w.-]+) [^\]]*\]\$"
+ALLOCATION_TIMEOUT = 300
+JUPYTER_TIMEOUT = 120
+
 class HPCSessionManager:
     def __init__(self, username, password, use_gpu, cpu_time, num_nodes, num_tasks):
         self.username = username
@@ -41,44 +46,19 @@ class HPCSessionManager:
 
             # Request an interactive session
             self.session.sendline(command)
-            time.sleep(5)  # Allow some time for allocation
-            # Check if session is allocated
-            print("🔄 Checking allocated node...")
-            self.session.sendline("echo $SHELL")
-            self.session.expect(r"\[.*@.* ~\]\$", timeout=20)  # Expect shell prompt after running the command
-
-            # Get the shell output and the prompt
-            shell_output = self.session.before.decode()
-            raw_prompt = self.session.after.decode()
-
-            print(f"Shell output: {shell_output}")
-            print(f"Detected prompt: {raw_prompt}")
-
-            # Check if session is allocated
-            print("🔄 Checking allocated node...")
-            self.session.sendline("hostname")
-            self.session.expect(r"(\w+)", timeout=20)
-
-            match = re.search(r"@(\w+)", raw_prompt)
-            if match:
-                self.node_name = match.group(1)
-                if self.node_name != "coe-hpc1":  # Not the login node
-                    print(f"Interactive session allocated. Node: {self.node_name}")
-                else:
-                    print("Still on the login node.")
-            else:
-                print("No valid node prompt detected.")
 
-            if self.node_name == "coe-hpc1":
-                print("❌ Error: Allocation failed. Still on the login node.")
+            # Wait for srun to land on a compute node instead of sleeping
+            print("🔄 Waiting for node allocation...")
+            self.node_name = self.wait_for_allocation()
+            if not self.node_name:
+                print("❌ Error: Allocation failed.")
                 return False
-
-            time.sleep(5)
+            print(f"Interactive session allocated. Node: {self.node_name}")
 
             # Load Python and start Jupyter Notebook in background
             print("🚀 Starting Jupyter Notebook...")
             self.session.sendline(f"module load python3; jupyter notebook --no-browser --port={self.port}")
-            self.session.expect(r"token=([\w\d]+)", timeout=20)  # Expect PID of Jupyter process
+            self.session.expect(r"token=([\w\d]+)", timeout=JUPYTER_TIMEOUT)
 
             token = self.session.match.group(1).decode()
             self.jupyter_url = f"http://127.0.0.1:{self.port}/?token={token}"
@@ -97,6 +77,28 @@ class HPCSessionManager:
         
 
 
+    def wait_for_allocation(self, timeout=ALLOCATION_TIMEOUT):
+        """Follow srun's output until a compute-node prompt appears; returns the node name or None."""
+        deadline = time.time() + timeout
+        while True:
+            index = self.session.expect([
+                r"job (\d+) queued and waiting for resources",
+                r"srun: error: ([^\r\n]*)",
+                NODE_PROMPT,
+                pexpect.TIMEOUT,
+                pexpect.EOF,
+            ], timeout=max(deadline - time.time(), 0))
+            if index == 0:
+                print(f"⏳ Job {self.session.match.group(1).decode()} queued, waiting for resources...")
+            elif index == 1:
+                print(f"❌ srun error: {self.session.match.group(1).decode()}")
+                return None
+            elif index == 2:
+                node_name = self.session.match.group(1).decode()
+                return None if node_name == LOGIN_HOSTNAME else node_name
+            else:
+                return None
+
     def setup_ssh_tunnel(self):
         """Sets up a persistent SSH tunnel."""
         try:
@@ -206,24 +208,33 @@ def show_running_jobs():
     except Exception as e:
         messagebox.showerror("Error", f"Failed to fetch running jobs: {e}")
 
-def delete_job(item):
-    """Deletes a selected job and refreshes the table."""
+def delete_jobs(items):
+    """Deletes the selected jobs with a single login and scancel, then updates the table."""
+    if not items:
+        return
     try:
         username = username_entry.get()
         password = password_entry.get()
-        job_id = jobs_table.item(item, "values")[0]
-        
+        job_ids = [jobs_table.item(item, "values")[0] for item in items]
+
         session = pexpect.spawn(f"ssh {username}@coe-hpc1.sjsu.edu", timeout=30)
         session.expect(r"Password:")
         session.sendline(password)
         session.expect(r"\[.*@.* ~\]\$", timeout=30)
-        session.sendline(f"scancel {job_id}")
+        session.sendline(f"scancel {' '.join(job_ids)}")
         session.expect(r"\[.*@.* ~\]\$", timeout=30)
+        output = session.before.decode(errors="replace")
         session.close()
 
-        jobs_table.delete(item)
+        # scancel names each job it couldn't cancel; keep those rows
+        failed = set(re.findall(r"job id (\S+?):", output))
+        for item, job_id in zip(items, job_ids):
+            if job_id not in failed:
+                jobs_table.delete(item)
+        if failed:
+            messagebox.showerror("Error", f"Failed to delete jobs: {', '.join(sorted(failed))}")
     except Exception as e:
-        messagebox.showerror("Error", f"Failed to delete job: {e}")
+        messagebox.showerror("Error", f"Failed to delete jobs: {e}")
 
 def update_jupyter_button(url):
     jupyter_button.config(state=tk.NORMAL, text="Open Jupyter", command=lambda: open_jupyter(url))
@@ -298,9 +309,13 @@ for col in columns:
     jobs_table.column(col, anchor="center", width=100)
 
 jobs_table.pack(expand=True, fill="both", pady=10)
-jobs_table.bind("<Double-1>", lambda e: delete_job(jobs_table.selection()[0]))
+jobs_table.bind("<Double-1>", lambda e: delete_jobs(jobs_table.selection()))
+jobs_table.bind("<Delete>", lambda e: delete_jobs(jobs_table.selection()))
 
 refresh_button = ttk.Button(tab2_frame, text="\U0001F504 Refresh Jobs", command=show_running_jobs)
 refresh_button.pack(pady=5, ipadx=10)
 
+delete_button = ttk.Button(tab2_frame, text="\U0001F5D1 Delete Selected", command=lambda: delete_jobs(jobs_table.selection()))
+delete_button.pack(pady=5, ipadx=10)
+
 root.mainloop()
\ No newline at end of file
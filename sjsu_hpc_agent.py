@@ -1,6 +1,5 @@
 import os
 import random
-import re
 import subprocess
 import sys
 import time
@@ -9,6 +8,41 @@ from getpass import getpass
 import pexpect
 
 
+LOGIN_HOSTNAME = "coe-hpc1"
+NODE_PROMPT = r"\[[^@\]\s]+@([\w.-]+) [^\]]*\]\$"
+ALLOCATION_TIMEOUT = 300
+JUPYTER_TIMEOUT = 120
+
+
+def wait_for_allocation(child, timeout=ALLOCATION_TIMEOUT):
+    """Follow srun's output until a compute-node prompt appears; returns the node name or None."""
+    deadline = time.time() + timeout
+    while True:
+        index = child.expect(
+            [
+                r"job (\d+) queued and waiting for resources",
+                r"srun: error: ([^\r\n]*)",
+                NODE_PROMPT,
+                pexpect.TIMEOUT,
+                pexpect.EOF,
+            ],
+            timeout=max(deadline - time.time(), 0),
+        )
+        if index == 0:
+            print(f"⏳ Job {child.match.group(1).decode()} queued, waiting for resources...")
+        elif index == 1:
+            print(f"❌ srun error: {child.match.group(1).decode()}")
+            return None
+        elif index == 2:
+            node_name = child.match.group(1).decode()
+            if node_name == LOGIN_HOSTNAME:
+                print("Still on the login node.")
+                return None
+            return node_name
+        else:
+            return None
+
+
 def request_interactive_session(username, password, port, use_gpu=False, retries=3):
     """Logs into the HPC, requests an interactive node, and starts Jupyter Notebook in one session."""
     command = "srun "
@@ -32,40 +66,20 @@ def request_interactive_session(username, password, port, use_gpu=False, retries
 
             # Request an interactive session
             child.sendline(command)
-            time.sleep(5)  # Allow some time for allocation
-
-            # Check if session is allocated
-            print("🔄 Checking allocated node...")
-            child.sendline("echo $SHELL")
-            child.expect(
-                r"\[.*@.* ~\]\$", timeout=20
-            )  # Expect shell prompt after running the command
-
-            # Get the shell output and the prompt
-            shell_output = child.before.decode()
-            raw_prompt = child.after.decode()
-
-            print(f"Shell output: {shell_output}")
-            print(f"Detected prompt: {raw_prompt}")
-
-            # Check if the prompt is for a node
-            match = re.search(r"@(\w+)", raw_prompt)
-            if match:
-                node_name = match.group(1)
-                if node_name != "coe-hpc1":  # Not the login node
-                    print(f"Interactive session allocated. Node: {node_name}")
-                else:
-                    print("Still on the login node.")
-            else:
-                print("No valid node prompt detected.")
 
-            time.sleep(5)
+            # Wait for srun to land on a compute node instead of sleeping
+            print("🔄 Waiting for node allocation...")
+            node_name = wait_for_allocation(child)
+            if not node_name:
+                raise pexpect.exceptions.TIMEOUT("No compute node allocated")
+            print(f"Interactive session allocated. Node: {node_name}")
+
             # Load Python and start Jupyter Notebook
             print("🚀 Starting Jupyter Notebook...")
             child.sendline(
                 f"module load python3; jupyter notebook --no-browser --port={port}"
             )
-            child.expect(r"token=([\w\d]+)", timeout=50)  # Wait for token pattern
+            child.expect(r"token=([\w\d]+)", timeout=JUPYTER_TIMEOUT)  # Wait for token pattern
 
             # Extract the token directly from the matched output
             token = child.match.group(1).decode()  # Group 1 contains the token
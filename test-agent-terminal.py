@@ -1,10 +1,12 @@
 import getpass
 import json
 import logging
-import platform
 import re
 import subprocess
 from colorama import Fore, Style, init
+from command_cache import command_cache
+from context_gatherer import execute_context_commands
+from ollama_client import ProgressLine, ollama, preload_in_background
 
 # Initialize colorama
 init(autoreset=True)
@@ -19,19 +21,11 @@ logging.basicConfig(
     ],
 )
 
-CONTEXT_COMMANDS_FILE = "context_commands.txt"
 MAX_RETRIES = 5
+COMMAND_MODEL = "deepseek-coder"
+ANALYSIS_MODEL = "deepseek-r1"
 SAFE_COMMANDS = ['pwd', 'ls', 'echo', 'find', 'cd', 'cat', 'grep', 'curl', 'wget']
 
-def detect_os():
-    """Detect the operating system"""
-    system = platform.system().lower()
-    return {
-        "darwin": "macos",
-        "linux": "linux",
-        "windows": "windows"
-    }.get(system, "unknown")
-
 def is_command_safe(command):
     """Enhanced safety check with command whitelisting"""
     # First check against dangerous patterns
@@ -69,19 +63,18 @@ def generate_command(prompt, context):
         "Format: plain text without markdown or code blocks."
     )
 
+    progress = ProgressLine("Generating command")
     try:
-        result = subprocess.run(
-            ['ollama', 'run', 'deepseek-coder', prompt_template],
-            text=True,
-            capture_output=True,
-            timeout=10
+        raw_command = ollama.first_line(
+            COMMAND_MODEL, prompt_template, timeout=10, on_text=progress.update
         )
-        raw_command = result.stdout.strip()
         return sanitize_command(raw_command)
-    except subprocess.TimeoutExpired:
+    except TimeoutError:
         return "echo 'Error: Command generation timed out'"
     except Exception as e:
         return f"echo 'Error: {str(e)}'"
+    finally:
+        progress.clear()
 
 def execute_command(command):
     """Enhanced execution with privilege escalation handling"""
@@ -138,14 +131,13 @@ def analyze_results(original_prompt, command, output, returncode):
         "Return ONLY: 'SUCCESS', 'SAFE_OVERRIDE', or the NEW COMMAND."
     )
 
+    progress = ProgressLine("Analyzing output")
     try:
-        result = subprocess.run(
-            ['ollama', 'run', 'deepseek-r1', analysis_prompt],
-            text=True,
-            capture_output=True,
-            timeout=15
+        raw_response = ollama.generate(
+            ANALYSIS_MODEL, analysis_prompt, timeout=15, on_text=progress.update
         )
-        response = result.stdout.strip().upper()
+        progress.clear()
+        response = raw_response.strip().upper()
         
         if "SUCCESS" in response:
             return "SUCCESS"
@@ -154,68 +146,37 @@ def analyze_results(original_prompt, command, output, returncode):
             confirm = input(Fore.YELLOW + "Run this command anyway? (y/n): ").lower()
             return command if confirm == 'y' else None
         else:
-            return sanitize_command(result.stdout)
+            return sanitize_command(raw_response)
             
     except Exception:
+        progress.clear()
         return None
 
-def load_context_commands():
-    """Load OS-specific context commands"""
-    current_os = detect_os()
-    try:
-        with open(CONTEXT_COMMANDS_FILE, "r") as file:
-            commands = []
-            current_section = None
-            for line in file:
-                line = line.strip()
-                if line.startswith("#"):
-                    current_section = line[1:].strip().lower()
-                elif current_section == current_os:
-                    commands.append(line)
-            return commands
-    except FileNotFoundError:
-        logging.error(f"Missing {CONTEXT_COMMANDS_FILE} file!")
-        return []
-
-# Rest of the functions remain the same as previous implementation
-def execute_context_commands():
-    """OS-aware context gathering"""
-    commands = load_context_commands()
-    context_data = {"os": detect_os()}
-
-    print(Fore.CYAN + "\n=== Gathering System Context ===")
-    for cmd in commands:
-        if cmd and not cmd.startswith("#"):
-            try:
-                result = subprocess.run(
-                    cmd,
-                    shell=True,
-                    check=True,
-                    text=True,
-                    capture_output=True,
-                    timeout=5
-                )
-                context_data[cmd] = result.stdout.strip()
-                logging.info(f"Context command succeeded: {cmd}")
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                error_msg = f"Error: {e.stderr}" if hasattr(e, "stderr") else "Timeout"
-                context_data[cmd] = error_msg
-                logging.error(f"Context command failed: {cmd} - {error_msg}")
-
-    with open("system_context.json", "w") as f:
-        json.dump(context_data, f, indent=2)
-    print(Fore.CYAN + "=== System Context Saved ===\n")
-
 def main():
     print(Fore.YELLOW + "=== Smart Terminal Assistant ===")
-    execute_context_commands()
+    preload_in_background(COMMAND_MODEL, ANALYSIS_MODEL)
+    context_gatherer = execute_context_commands()
     
     while True:
         try:
             user_input = input("\nYou: ").strip()
             if user_input.lower() in ["exit", "quit"]:
-                print(Fore.YELLOW + "Goodbye!")
+                print(Fore.YELLOW + f"Goodbye! (command cache: {command_cache.stats()})")
                 break
+            # Re-run probes whose TTL ran out while the session was open (not the volatile ones)
+            context_gatherer.refresh(volatile=False)
+            cache_key = (user_input, context_gatherer.os, context_gatherer.context_hash())
+
+            # A command that answered this before skips both model calls
+            command = command_cache.get(*cache_key)
+            if command:
+                result = execute_command(command)
+                print(Fore.CYAN + f"\nExecuted cached command: {command}")
+                print(Fore.BLUE + "Output:\n" + result['output'])
+                if result['status'] == "success":
+                    print(Fore.GREEN + "\n✅ Task completed successfully!")
+                    continue
+                command_cache.discard(*cache_key)
 
             # Load system context
             try:
@@ -244,6 +205,7 @@ def main():
 
                 if analysis == "SUCCESS":
                     print(Fore.GREEN + "\n✅ Task completed successfully!")
+                    command_cache.put(*cache_key, command)
                     break
                 elif analysis and analysis != command:
                     print(Fore.MAGENTA + f"\n🔄 Retrying with: {analysis}")
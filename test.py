@@ -2,8 +2,10 @@ import json
 import logging
 import re
 import subprocess
-import platform
 from colorama import Fore, Style, init
+from command_cache import command_cache
+from context_gatherer import execute_context_commands
+from ollama_client import ProgressLine, ollama, preload_in_background
 
 # Initialize colorama
 init(autoreset=True)
@@ -18,39 +20,9 @@ logging.basicConfig(
     ],
 )
 
-CONTEXT_COMMANDS_FILE = "context_commands.txt"
+COMMAND_MODEL = "deepseek-coder"
 DANGEROUS_KEYWORDS = ["rm", "format", "dd", "shutdown", ">", "&", ";", "sudo", "mkfs", "passwd"]
 
-def detect_os():
-    """Detect the operating system"""
-    system = platform.system().lower()
-    if system == "darwin":
-        return "macos"
-    elif system == "linux":
-        return "linux"
-    elif system == "windows":
-        return "windows"
-    else:
-        return "unknown"
-
-def load_context_commands():
-    """Load OS-specific context commands"""
-    current_os = detect_os()
-    try:
-        with open(CONTEXT_COMMANDS_FILE, "r") as file:
-            commands = []
-            current_section = None
-            for line in file:
-                line = line.strip()
-                if line.startswith("#"):
-                    current_section = line[1:].strip().lower()
-                elif current_section == current_os:
-                    commands.append(line)
-            return commands
-    except FileNotFoundError:
-        logging.error(f"Missing {CONTEXT_COMMANDS_FILE} file!")
-        return []
-
 def is_command_safe(command):
     """Improved safety check"""
     command_lower = command.lower()
@@ -67,34 +39,6 @@ def sanitize_command(command):
     # Take only the first line and split on first non-command character
     return command.split("\n")[0].split("#")[0].split("//")[0]
 
-def execute_context_commands():
-    """OS-aware context gathering"""
-    commands = load_context_commands()
-    context_data = {"os": detect_os()}
-
-    print(Fore.CYAN + "\n=== Gathering System Context ===")
-    for cmd in commands:
-        if cmd and not cmd.startswith("#"):
-            try:
-                result = subprocess.run(
-                    cmd,
-                    shell=True,
-                    check=True,
-                    text=True,
-                    capture_output=True,
-                    timeout=5
-                )
-                context_data[cmd] = result.stdout.strip()
-                logging.info(f"Context command succeeded: {cmd}")
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                error_msg = f"Error: {e.stderr}" if hasattr(e, "stderr") else "Timeout"
-                context_data[cmd] = error_msg
-                logging.error(f"Context command failed: {cmd} - {error_msg}")
-
-    with open("system_context.json", "w") as f:
-        json.dump(context_data, f, indent=2)
-    print(Fore.CYAN + "=== System Context Saved ===\n")
-
 def interpret_prompt(prompt):
     """Improved prompt handling with proper escaping"""
     try:
@@ -109,29 +53,28 @@ def interpret_prompt(prompt):
         "Return ONLY THE COMMAND with no explanations or formatting."
     )
 
+    progress = ProgressLine("Generating command")
     try:
-        result = subprocess.run(
-            ['ollama', 'run', 'deepseek-coder', prompt_template],
-            text=True,
-            capture_output=True,
-            timeout=10
+        return sanitize_command(
+            ollama.first_line(COMMAND_MODEL, prompt_template, timeout=10, on_text=progress.update)
         )
-        return sanitize_command(result.stdout)
-    except subprocess.TimeoutExpired:
+    except TimeoutError:
         return "echo 'Error: Command generation timed out'"
     except Exception as e:
         return f"echo 'Error: {str(e)}'"
+    finally:
+        progress.clear()
 
 def execute_command(command):
-    """Safer execution with better error handling"""
+    """Safer execution with better error handling; returns (output, succeeded)"""
     if not command or command.startswith("echo 'Error"):
-        return "Invalid command"
+        return "Invalid command", False
 
     if not is_command_safe(command):
         error_msg = f"Blocked potentially unsafe command: {command}"
         logging.error(error_msg)
         print(Fore.RED + error_msg)
-        return error_msg
+        return error_msg, False
 
     try:
         logging.info(f"Executing: {command}")
@@ -145,31 +88,43 @@ def execute_command(command):
         )
         output = result.stdout if result.returncode == 0 else result.stderr
         print(Fore.BLUE + "Output:\n" + output)
-        return output
+        return output, result.returncode == 0
     except subprocess.TimeoutExpired:
         error_msg = "Command timed out (15s)"
         logging.error(error_msg)
         print(Fore.RED + error_msg)
-        return error_msg
+        return error_msg, False
     except Exception as e:
         error_msg = f"Error: {str(e)}"
         logging.error(error_msg)
         print(Fore.RED + error_msg)
-        return error_msg
+        return error_msg, False
 
 def main():
     print(Fore.YELLOW + "=== Smart Terminal Assistant ===")
-    execute_context_commands()
+    preload_in_background(COMMAND_MODEL)
+    context_gatherer = execute_context_commands()
     
     while True:
         try:
             user_input = input("\nYou: ")
             if user_input.lower() in ["exit", "quit"]:
-                print(Fore.YELLOW + "Goodbye!")
+                print(Fore.YELLOW + f"Goodbye! (command cache: {command_cache.stats()})")
                 break
+            # Re-run probes whose TTL ran out while the session was open (not the volatile ones)
+            context_gatherer.refresh(volatile=False)
+            cache_key = (user_input, context_gatherer.os, context_gatherer.context_hash())
                 
-            command = interpret_prompt(user_input)
-            execute_command(command)
+            command = command_cache.get(*cache_key)
+            if command:
+                print(Fore.CYAN + f"Cached command: {command}")
+            else:
+                command = interpret_prompt(user_input)
+            output, succeeded = execute_command(command)
+            if succeeded:
+                command_cache.put(*cache_key, command)
+            else:
+                command_cache.discard(*cache_key)
             
         except KeyboardInterrupt:
             print(Fore.YELLOW + "\nOperation canceled by user.")